@@ -0,0 +1,170 @@
+import math
+from datetime import datetime, timedelta
+
+# Relative accuracy of percentiles read from the rollups
+SKETCH_ACCURACY = 0.02
+# Periods up to this long are answered from hourly buckets; longer ones read
+# daily buckets for whole days and hourly buckets for the partial days at either end
+HOURLY_UP_TO = timedelta(hours=48)
+
+EVENTS = ('open', 'claim', 'unclaim', 'close')
+
+
+class Sketch:
+    """Log-bucketed histogram with a fixed relative error (like DDSketch).
+
+    A value ``v`` falls in bucket ``ceil(log(v) / log(gamma))``; the bucket's
+    midpoint is within ``accuracy`` of every value in it. Buckets are plain
+    counters, so sketches merge by adding counts and can be maintained with
+    MongoDB ``$inc`` updates.
+    """
+
+    def __init__(self, accuracy=SKETCH_ACCURACY):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+
+    def bucket(self, value):
+        return math.ceil(math.log(max(value, 1.0)) / self._log_gamma)
+
+    def value(self, bucket):
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def quantile(self, counts, q):
+        """Value at quantile ``q`` of a {bucket: count} mapping, None if empty"""
+        total = sum(counts.values())
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for bucket in sorted(counts):
+            seen += counts[bucket]
+            if seen > rank:
+                return self.value(bucket)
+        return self.value(max(counts))
+
+
+def bucket_ids(guild_id, since, until):
+    """Ids of the rollup documents covering [since, until], with ``since``
+    rounded down to the hour"""
+    start = bucket_start(since)
+    if until - since <= HOURLY_UP_TO:
+        return _ids(guild_id, 'hour', start, until)
+    first_day = start.replace(hour=0)
+    if first_day < start:
+        first_day += timedelta(days=1)
+    last_day = until.replace(hour=0, minute=0, second=0, microsecond=0)
+    return (_ids(guild_id, 'hour', start, first_day - timedelta(hours=1))
+            + _ids(guild_id, 'day', first_day, last_day - timedelta(days=1))
+            + _ids(guild_id, 'hour', last_day, until))
+
+
+def bucket_start(at):
+    """Start of the hourly bucket ``at`` falls in"""
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def _ids(guild_id, granularity, start, until):
+    step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+    ids = []
+    while start <= until:
+        ids.append(rollup_id(guild_id, granularity, start))
+        start += step
+    return ids
+
+
+def rollup_id(guild_id, granularity, start):
+    fmt = '%Y-%m-%dT%H' if granularity == 'hour' else '%Y-%m-%d'
+    return f'{guild_id}:{granularity}:{start.strftime(fmt)}'
+
+
+class Analytics:
+    """Ticket history: an append-only event log plus hourly and daily rollups.
+
+    Every open, claim, unclaim and close is inserted into ``ticket_events``
+    and counted into one hourly and one daily document in ``ticket_rollups``
+    with ``$inc`` updates: counts per event and type, per staff member, and
+    sketches of time-to-claim and time-to-close. The write-behind queue sums
+    the increments, so a busy hour costs one write per flush. ``summary``
+    reads at most a few dozen rollup documents whatever the ticket volume,
+    counting from the start of the hour the period begins in.
+    """
+
+    def __init__(self, db, sketch=None):
+        self.db = db
+        self.sketch = sketch or Sketch()
+
+    @property
+    def enabled(self):
+        return bool(self.db and self.db.connected)
+
+    async def create_indexes(self):
+        await self.db.create_index('ticket_events', [('guild_id', 1), ('at', 1)])
+
+    async def record(self, event, ticket, actor_id, at=None, duration=None):
+        """Log one ticket event; ``duration`` is the time to claim (first
+        claim only) or to close, as a timedelta"""
+        if not self.enabled:
+            return
+        at = at or datetime.utcnow()
+        await self.db.insert('ticket_events', {
+            'guild_id': ticket.guild_id,
+            'channel_id': ticket.channel_id,
+            'type': ticket.type,
+            'event': event,
+            'user_id': ticket.user_id,
+            'actor_id': actor_id,
+            'at': at,
+            'duration': duration.total_seconds() if duration is not None else None
+        })
+
+        ticket_type = ticket.type or 'unknown'
+        inc = {f'events.{event}.all': 1, f'events.{event}.{ticket_type}': 1}
+        if actor_id and event in ('claim', 'close'):
+            inc[f'staff.{actor_id}.{event}'] = 1
+        if duration is not None and event in ('claim', 'close'):
+            bucket = self.sketch.bucket(duration.total_seconds())
+            inc[f'sketch.{event}.all.{bucket}'] = 1
+            inc[f'sketch.{event}.{ticket_type}.{bucket}'] = 1
+
+        for granularity, start in (('hour', bucket_start(at)),
+                                   ('day', at.replace(hour=0, minute=0, second=0, microsecond=0))):
+            await self.db.update(
+                'ticket_rollups',
+                {'_id': rollup_id(ticket.guild_id, granularity, start)},
+                {'$inc': inc, '$setOnInsert': {'guild_id': ticket.guild_id, 'granularity': granularity, 'start': start}}
+            )
+
+    async def summary(self, guild_id, period, now=None):
+        """Totals, per-type counts, top staff and percentiles for the last ``period``"""
+        now = now or datetime.utcnow()
+        docs = await self.db.find('ticket_rollups', {'_id': {'$in': bucket_ids(guild_id, now - period, now)}})
+
+        events = {event: {} for event in EVENTS}
+        staff = {}
+        sketches = {'claim': {}, 'close': {}}
+        for doc in docs:
+            for event, counts in doc.get('events', {}).items():
+                _add(events.setdefault(event, {}), counts)
+            for user_id, counts in doc.get('staff', {}).items():
+                _add(staff.setdefault(int(user_id), {}), counts)
+            for event, by_type in doc.get('sketch', {}).items():
+                buckets = sketches.setdefault(event, {}).setdefault('all', {})
+                _add(buckets, {int(b): n for b, n in by_type.get('all', {}).items()})
+
+        def percentiles(event):
+            counts = sketches[event].get('all', {})
+            return {q: self.sketch.quantile(counts, q) for q in (0.5, 0.9)}
+
+        return {
+            'since': bucket_start(now - period),
+            'buckets': len(docs),
+            'events': events,
+            'staff': staff,
+            'time_to_claim': percentiles('claim'),
+            'time_to_close': percentiles('close')
+        }
+
+
+def _add(target, counts):
+    for key, value in counts.items():
+        target[key] = target.get(key, 0) + value
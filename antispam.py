@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+# Drop idle buckets once this many are tracked
+PRUNE_AT = 10000
+
+
+class TicketRefused(Exception):
+    """Raised when a ticket can't be opened; ``channel_id`` points to the existing one"""
+
+    def __init__(self, message, channel_id=None):
+        super().__init__(message)
+        self.channel_id = channel_id
+
+
+def parse_limit(text):
+    """``(tickets, seconds)`` from a limit like ``3/600``"""
+    try:
+        tickets, seconds = text.split('/')
+        limit = (int(tickets), float(seconds))
+    except ValueError:
+        raise ValueError(f'Ticket limits look like 3/600 (tickets per seconds), got {text!r}') from None
+    if limit[0] < 1 or limit[1] <= 0:
+        raise ValueError(f'Ticket limits need at least 1 ticket and a positive period, got {text!r}')
+    return limit
+
+
+class TokenBucket:
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, per):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        # ``now`` may predate a bucket created in the same call
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(now, self.updated)
+
+    def retry_after(self, now=None):
+        """Seconds until a token is available, 0 if one is available now"""
+        self._refill(now or time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def give_back(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    @property
+    def full(self):
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class CreationGuard:
+    """Token-bucket limits and per-user locks for ticket creation.
+
+    ``user_limit`` and ``guild_limit`` are ``(tickets, seconds)`` pairs. Locks
+    are per (guild, user, type), so concurrent clicks on the same button run
+    one after another and the later ones see the ticket the first one made.
+    """
+
+    def __init__(self, user_limit, guild_limit):
+        self.user_limit = user_limit
+        self.guild_limit = guild_limit
+        self._users = {}
+        self._guilds = {}
+        self._locks = {}
+
+        # Counters
+        self.refused = 0
+
+    def lock(self, guild_id, user_id, ticket_type):
+        return _Held(self._locks, (guild_id, user_id, ticket_type))
+
+    def acquire(self, guild_id, user_id):
+        """Take a token from both the user's and the guild's bucket.
+
+        Returns 0 on success, otherwise the seconds to wait (nothing is taken).
+        """
+        now = time.monotonic()
+        user = self._bucket(self._users, (guild_id, user_id), self.user_limit)
+        guild = self._bucket(self._guilds, guild_id, self.guild_limit)
+        wait = max(user.retry_after(now), guild.retry_after(now))
+        if wait:
+            self.refused += 1
+            return wait
+        user.take()
+        guild.take()
+        return 0.0
+
+    def refund(self, guild_id, user_id):
+        """Return the tokens of a creation that failed"""
+        for bucket in (self._users.get((guild_id, user_id)), self._guilds.get(guild_id)):
+            if bucket:
+                bucket.give_back()
+
+    def _bucket(self, buckets, key, limit):
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= PRUNE_AT:
+                for stale in [k for k, b in buckets.items() if b.full]:
+                    del buckets[stale]
+            bucket = buckets[key] = TokenBucket(*limit)
+        return bucket
+
+
+class _Held:
+    """Async context manager that drops the lock from the table once unused"""
+
+    __slots__ = ('locks', 'key', 'entry')
+
+    def __init__(self, locks, key):
+        self.locks = locks
+        self.key = key
+        self.entry = None
+
+    async def __aenter__(self):
+        self.entry = self.locks.get(self.key)
+        if self.entry is None:
+            self.entry = self.locks[self.key] = [asyncio.Lock(), 0]
+        self.entry[1] += 1
+        try:
+            await self.entry[0].acquire()
+        except BaseException:
+            self._leave()
+            raise
+
+    async def __aexit__(self, *exc):
+        self.entry[0].release()
+        self._leave()
+
+    def _leave(self):
+        self.entry[1] -= 1
+        if not self.entry[1]:
+            self.locks.pop(self.key, None)
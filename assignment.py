@@ -0,0 +1,136 @@
+import heapq
+import time
+from collections import Counter
+
+import discord
+
+
+class GuildWorkload:
+    """Open claims per staff member of one guild, least loaded first.
+
+    Each staff role has a heap of ``(open claims, last assigned, staff id)``.
+    Changes push a fresh entry instead of updating in place; outdated entries
+    are skipped when they surface and the heap is rebuilt once they dominate.
+    """
+
+    def __init__(self):
+        self.load = Counter()  # staff id -> open claims (anyone who claimed, staff or not)
+        self.last = {}  # staff id -> when a ticket was last assigned to them
+        self.heaps = {}  # role id -> heap
+        self.roles = {}  # staff id -> role ids whose heap holds them
+
+    def _entry(self, staff_id):
+        return (self.load[staff_id], self.last.get(staff_id, 0.0), staff_id)
+
+    def add(self, role_id, staff_id):
+        roles = self.roles.setdefault(staff_id, set())
+        if role_id not in roles:
+            roles.add(role_id)
+            heapq.heappush(self.heaps.setdefault(role_id, []), self._entry(staff_id))
+
+    def remove(self, role_id, staff_id):
+        roles = self.roles.get(staff_id)
+        if roles:
+            roles.discard(role_id)
+            if not roles:
+                del self.roles[staff_id]
+
+    def changed(self, staff_id):
+        entry = self._entry(staff_id)
+        for role_id in self.roles.get(staff_id, ()):
+            heap = self.heaps[role_id]
+            heapq.heappush(heap, entry)
+            if len(heap) > 64 and len(heap) > 4 * len(self.roles):
+                self._rebuild(role_id)
+
+    def _rebuild(self, role_id):
+        heap = [self._entry(staff_id) for staff_id, roles in self.roles.items() if role_id in roles]
+        heapq.heapify(heap)
+        self.heaps[role_id] = heap
+
+    def pick(self, role_id, eligible):
+        """Least loaded staff member of the role for whom ``eligible(staff_id)`` holds"""
+        heap = self.heaps.get(role_id, [])
+        skipped = []
+        chosen = None
+        while heap:
+            entry = heapq.heappop(heap)
+            staff_id = entry[2]
+            if role_id not in self.roles.get(staff_id, ()) or entry != self._entry(staff_id):
+                continue  # outdated
+            if eligible(staff_id):
+                chosen = staff_id
+                break
+            skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        if chosen is not None:
+            self.last[chosen] = time.monotonic()
+            self.changed(chosen)
+        return chosen
+
+
+class AutoAssigner:
+    """Assigns new tickets to the least loaded online member of the ticket's role.
+
+    The members of a role are read once per guild (``role.members`` walks the
+    whole member list) and kept current from ``on_member_update``; claim
+    counts are fed from the ticket registry through ``claimed``/``released``.
+    Presence needs the presences intent; without it nobody counts as online.
+    """
+
+    def __init__(self):
+        self._guilds = {}
+        self._seeded = set()  # (guild id, role id)
+
+    def guild(self, guild_id):
+        workload = self._guilds.get(guild_id)
+        if workload is None:
+            workload = self._guilds[guild_id] = GuildWorkload()
+        return workload
+
+    def claimed(self, guild_id, staff_id):
+        workload = self.guild(guild_id)
+        workload.load[staff_id] += 1
+        workload.changed(staff_id)
+
+    def released(self, guild_id, staff_id):
+        workload = self.guild(guild_id)
+        if workload.load[staff_id] > 0:
+            workload.load[staff_id] -= 1
+        if not workload.load[staff_id]:
+            del workload.load[staff_id]
+        workload.changed(staff_id)
+
+    def load(self, guild_id, staff_id):
+        return self.guild(guild_id).load[staff_id]
+
+    def member_updated(self, before, after):
+        """Follow role changes of members in roles that are already indexed"""
+        if before.roles == after.roles:
+            return
+        guild_id = after.guild.id
+        old = {role.id for role in before.roles}
+        new = {role.id for role in after.roles}
+        for role_id in new - old:
+            if (guild_id, role_id) in self._seeded and not after.bot:
+                self.guild(guild_id).add(role_id, after.id)
+        for role_id in old - new:
+            if (guild_id, role_id) in self._seeded:
+                self.guild(guild_id).remove(role_id, after.id)
+
+    def pick(self, guild, role):
+        """The member to assign, or None if nobody in the role is online"""
+        workload = self.guild(guild.id)
+        if (guild.id, role.id) not in self._seeded:
+            for member in role.members:
+                if not member.bot:
+                    workload.add(role.id, member.id)
+            self._seeded.add((guild.id, role.id))
+
+        def eligible(staff_id):
+            member = guild.get_member(staff_id)
+            return member is not None and member.status != discord.Status.offline
+
+        staff_id = workload.pick(role.id, eligible)
+        return guild.get_member(staff_id) if staff_id is not None else None
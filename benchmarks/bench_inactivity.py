@@ -0,0 +1,80 @@
+"""Cost of inactivity tracking with many open tickets.
+
+Tracks N tickets in the InactivitySweeper, replays a stream of messages
+into them, then advances a simulated clock past the timeout and the grace
+period and times the sweeps that warn and close the idle ones.
+
+Run from the repository root:
+    python benchmarks/bench_inactivity.py --tickets 100000 --messages 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from inactivity import InactivitySweeper  # noqa: E402
+
+TIMEOUTS = {'partnership': 7 * 86400, 'middleman': 7 * 86400, 'support': 48 * 3600}
+GRACE = 12 * 3600
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+async def noop(*args):
+    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=100_000)
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    parser.add_argument('--active', type=float, default=0.5, help='share of tickets that get messages')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    clock = Clock()
+    sweeper = InactivitySweeper(GRACE, noop, noop, clock=clock)
+    timeouts = list(TIMEOUTS.values())
+
+    started = time.perf_counter()
+    for channel_id in range(args.tickets):
+        sweeper.track(channel_id, timeouts[channel_id % len(timeouts)], clock.now - rng.uniform(0, 86400))
+    track = time.perf_counter() - started
+
+    # Messages land in the active share of tickets over the next day
+    active = max(1, int(args.tickets * args.active))
+    channels = [rng.randrange(active) for _ in range(args.messages)]
+    started = time.perf_counter()
+    for i, channel_id in enumerate(channels):
+        sweeper.touch(channel_id, clock.now + i * 86400 / args.messages)
+    touch = time.perf_counter() - started
+    clock.now += 86400
+
+    rows = []
+    for label, advance in (('after 48h', 48 * 3600), ('after 7d', 6 * 86400), ('after grace', GRACE)):
+        clock.now += advance
+        started = time.perf_counter()
+        warn, close = sweeper.sweep()
+        rows.append((label, len(warn), len(close), time.perf_counter() - started))
+
+    print(f'{args.tickets} tickets, {args.messages} messages\n')
+    print(f'track    {track * 1000:8.1f} ms  ({track / args.tickets * 1e6:.2f} us/ticket)')
+    print(f'touch    {touch * 1000:8.1f} ms  ({touch / args.messages * 1e6:.3f} us/message)')
+    print(f"\n{'sweep':<14}{'warned':>8}{'closed':>8}{'ms':>10}")
+    for label, warned, closed, seconds in rows:
+        print(f'{label:<14}{warned:>8}{closed:>8}{seconds * 1000:>10.1f}')
+    print(f'\nstill tracked: {len(sweeper)}, heap entries: {len(sweeper._heap)}')
+
+
+if __name__ == '__main__':
+    main()
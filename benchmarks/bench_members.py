@@ -0,0 +1,127 @@
+"""Memory used by guild members with the default cache and with LOW_MEMORY.
+
+Builds a synthetic guild with real discord.py state objects and measures
+the Python heap with tracemalloc:
+
+  full        members intent with the default cache: every member is
+              chunked at startup and kept, along with its user
+  low-memory  MemberCacheFlags.none() without chunking; only members that
+              commands looked up sit in the MemberCache LRU
+
+Run from the repository root:
+    python benchmarks/bench_members.py --members 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import discord  # noqa: E402
+from discord.state import ConnectionState  # noqa: E402
+
+from members import CACHE_SIZE, MemberCache  # noqa: E402
+
+GUILD_ID = 900000000000000000
+BOT_ID = 800000000000000000
+
+
+def member_payload(i, roles):
+    return {
+        'user': {
+            'id': str(GUILD_ID + 1 + i),
+            'username': f'member{i}',
+            'global_name': f'Member {i}',
+            'discriminator': '0',
+            'avatar': f'{i:032x}'
+        },
+        'roles': roles[:i % 4],
+        'joined_at': '2024-01-01T00:00:00+00:00',
+        'nick': f'nick{i}' if i % 5 == 0 else None,
+        'deaf': False,
+        'mute': False,
+        'flags': 0
+    }
+
+
+def make_state(low_memory):
+    intents = discord.Intents.default()
+    intents.members = True
+    options = {'intents': intents}
+    if low_memory:
+        options['member_cache_flags'] = discord.MemberCacheFlags.none()
+        options['chunk_guilds_at_startup'] = False
+    state = ConnectionState(dispatch=lambda *args: None, handlers={}, hooks={}, http=None, **options)
+    state.user = discord.ClientUser(state=state, data={
+        'id': str(BOT_ID), 'username': 'TicketBot', 'discriminator': '0', 'avatar': None, 'bot': True
+    })
+    return state
+
+
+def make_guild(state, member_count, roles):
+    bot_member = member_payload(-1, roles)
+    bot_member['user']['id'] = str(BOT_ID)
+    return discord.Guild(state=state, data={
+        'id': str(GUILD_ID),
+        'name': 'Synthetic guild',
+        'owner_id': str(BOT_ID),
+        'member_count': member_count,
+        'roles': [{'id': role, 'name': f'role{role}', 'permissions': '0', 'position': 1} for role in roles],
+        'channels': [],
+        'members': [bot_member],
+        'features': [],
+        'emojis': [],
+        'stickers': []
+    })
+
+
+def measure(low_memory, member_count, lookups):
+    gc.collect()
+    tracemalloc.start()
+    state = make_state(low_memory)
+    roles = [str(GUILD_ID + 10_000_000 + i) for i in range(4)]
+    guild = make_guild(state, member_count, roles)
+    cache = MemberCache()
+
+    if not low_memory:
+        # What GUILD_MEMBERS_CHUNK does for every member at startup
+        for i in range(member_count):
+            guild._add_member(discord.Member(data=member_payload(i, roles), guild=guild, state=state))
+    else:
+        # What fetch_member does for members that commands looked up
+        for i in range(lookups):
+            cache.put(discord.Member(data=member_payload(i % member_count, roles), guild=guild, state=state))
+
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'mode': 'low-memory' if low_memory else 'full',
+        'cached_members': len(guild._members) + len(cache),
+        'users': len(state._users),
+        'heap_mib': round(current / 2 ** 20, 1),
+        'peak_mib': round(peak / 2 ** 20, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=100_000)
+    parser.add_argument('--lookups', type=int, default=5 * CACHE_SIZE,
+                        help='members looked up by commands in low-memory mode')
+    args = parser.parse_args()
+
+    results = [measure(False, args.members, args.lookups), measure(True, args.members, args.lookups)]
+    print(f'{args.members} members, {args.lookups} lookups in low-memory mode (cache size {CACHE_SIZE})\n')
+    print(f"{'mode':<12}{'members':>10}{'users':>10}{'heap MiB':>12}{'peak MiB':>12}")
+    for r in results:
+        print(f"{r['mode']:<12}{r['cached_members']:>10}{r['users']:>10}{r['heap_mib']:>12}{r['peak_mib']:>12}")
+    full, low = results
+    if low['heap_mib']:
+        print(f"\nlow-memory mode uses {full['heap_mib'] / low['heap_mib']:.0f}x less memory for members")
+
+
+if __name__ == '__main__':
+    main()
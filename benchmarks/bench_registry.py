@@ -0,0 +1,72 @@
+"""Compare the old channel-scanning `.stats` with the ticket registry.
+
+Run from the repository root: python benchmarks/bench_registry.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tickets import Ticket, TicketRegistry
+
+CHANNELS = 10_000
+TICKET_SHARE = 0.5
+CLAIMED_SHARE = 0.3
+
+
+class FakeChannel:
+    __slots__ = ('id', 'name')
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+def build():
+    channels = []
+    claimed_tickets = {}
+    registry = TicketRegistry()
+    for i in range(CHANNELS):
+        if i < CHANNELS * TICKET_SHARE:
+            channel = FakeChannel(i, f'ticket-user{i}-support')
+            claimed = i < CHANNELS * TICKET_SHARE * CLAIMED_SHARE
+            if claimed:
+                claimed_tickets[i] = 1
+            registry.add(Ticket(i, 1, i, 'support', datetime.utcnow(), 1 if claimed else None))
+        else:
+            channel = FakeChannel(i, f'general-{i}')
+        channels.append(channel)
+    return channels, claimed_tickets, registry
+
+
+def main():
+    channels, claimed_tickets, registry = build()
+    probe = channels[CHANNELS // 4]
+
+    def scan_stats():
+        found = [c for c in channels if c.name.startswith('ticket-')]
+        claimed = [c for c in found if c.id in claimed_tickets]
+        return len(found), len(claimed)
+
+    def registry_stats():
+        counts = registry.guild(1)
+        return counts.open, counts.claimed
+
+    assert scan_stats() == registry_stats()
+
+    rows = [
+        ('stats: scan channels', scan_stats, 200),
+        ('stats: registry', registry_stats, 200_000),
+        ('guard: channel name', lambda: probe.name.startswith('ticket-'), 1_000_000),
+        ('guard: registry', lambda: probe.id in registry, 1_000_000),
+    ]
+    print(f'{CHANNELS} channels, {registry.guild(1).open} tickets')
+    for label, func, number in rows:
+        per_call = min(timeit.repeat(func, number=number, repeat=3)) / number
+        print(f'{label:<24} {per_call * 1e6:>10.3f} µs/call')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""Offline load test of the ticket hot paths.
+
+Replays a burst of ticket panel clicks across many guilds against the
+in-process fakes in benchmarks/fakes.py, then claims, adds five members,
+runs .stats (live and from the analytics rollups) and closes every ticket. ``--types`` gives
+every guild that many ticket types (the panel maximum is 50). Reports
+throughput, p50/p99 latency, REST calls and 429s per route, MongoDB
+operations and peak memory. Needs the packages from requirements.txt
+but no network or token.
+
+Run from the repository root:
+    python benchmarks/bench_tickets.py --clicks 1000 --guilds 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+TRANSCRIPT_DIR = tempfile.mkdtemp(prefix='ticket-bench-')
+os.environ.setdefault('MONGO_URL', 'mongodb://benchmark')
+os.environ['TRANSCRIPT_STORAGE'] = 'disk'
+os.environ['TRANSCRIPT_DIR'] = TRANSCRIPT_DIR
+
+import bot as app  # noqa: E402
+import logs  # noqa: E402
+from fakes import FakeContext, FakeGuild, FakeInteraction, FakeMongoClient, FakeREST, FakeUser  # noqa: E402
+from ticket_types import TicketTypes  # noqa: E402
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Phase:
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+        self.elapsed = 0.0
+
+    async def run(self, coros):
+        async def timed(coro):
+            started = time.perf_counter()
+            await coro
+            self.samples.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(timed(c) for c in coros))
+        self.elapsed = time.perf_counter() - started
+        return self
+
+    def report(self):
+        return {
+            'phase': self.name,
+            'ops': len(self.samples),
+            'seconds': round(self.elapsed, 3),
+            'ops_per_second': round(len(self.samples) / self.elapsed, 1) if self.elapsed else 0.0,
+            'p50_ms': round(percentile(self.samples, 0.5) * 1000, 2),
+            'p99_ms': round(percentile(self.samples, 0.99) * 1000, 2)
+        }
+
+
+async def click(guild, user, ticket_type):
+    # Through the same listener as a real component interaction
+    interaction = FakeInteraction(guild, user, custom_id=app.button_id(ticket_type))
+    await app.dispatch_ticket_button(interaction)
+    return interaction
+
+
+async def benchmark(args):
+    rest = FakeREST(args.latency / 1000, args.jitter / 1000, args.ratelimit_rate, seed=args.seed)
+    await app.db.connect(client=FakeMongoClient(args.mongo_latency / 1000))
+    app.CLOSE_DELAY = 0
+
+    guilds = [FakeGuild(rest, f'guild-{i}') for i in range(args.guilds)]
+    by_id = {}
+    for guild in guilds:
+        for i in range(len(app.ticket_types.keys(guild.id)), args.types):
+            await app.ticket_types.add(guild.id, f'type-{i}', f'Type {i}')
+    # A removed and re-added type must come back on a reload, not stay deleted
+    await app.ticket_types.remove(guilds[0].id, 'support')
+    await app.ticket_types.add(guilds[0].id, 'support', 'Support')
+    await app.db.flush()
+    reloaded = TicketTypes(app.db)
+    await reloaded.load()
+    assert reloaded.keys(guilds[0].id) == app.ticket_types.keys(guilds[0].id)
+    types = app.ticket_types.keys(guilds[0].id)
+    for guild in guilds:
+        role = guild.add_role('Staff')
+        for ticket_type in types:
+            app.ticket_roles.apply({'guild_id': str(guild.id), 'type': ticket_type, 'role_id': role.id})
+
+    def get_channel(channel_id):
+        for guild in guilds:
+            channel = guild.get_channel(channel_id)
+            if channel:
+                return channel
+        return None
+
+    app.bot.get_channel = get_channel
+    app.deletions.start()
+    app.lifecycle.mark_ready()
+
+    results = []
+
+    # 1. Burst of clicks spread across guilds, one per user
+    clicks = []
+    for i in range(args.clicks):
+        guild = guilds[i % len(guilds)]
+        user = FakeUser(f'user{i}')
+        clicks.append((guild, user, types[i % len(types)]))
+    results.append((await Phase('click -> channel').run(click(g, u, t) for g, u, t in clicks)).report())
+    await asyncio.sleep(0)
+    await asyncio.gather(*list(app.background_tasks))
+
+    opened = list(app.tickets)
+    for ticket in opened:
+        by_id[ticket.channel_id] = next(g for g in guilds if g.id == ticket.guild_id)
+
+    # 2. The same users mashing the button again must not open more tickets
+    spam = [click(g, u, t) for g, u, t in clicks[:args.guilds] for _ in range(args.spam)]
+    before = len(app.tickets)
+    report = (await Phase('repeat clicks (refused)').run(spam)).report()
+    report['extra_tickets'] = len(app.tickets) - before
+    results.append(report)
+
+    # 3. Claim every ticket
+    staff = FakeUser('staff')
+    contexts = [FakeContext(by_id[t.channel_id], staff, by_id[t.channel_id].get_channel(t.channel_id)) for t in opened]
+    results.append((await Phase('.claim').run(app.claim.callback(ctx) for ctx in contexts)).report())
+
+    # A five-person party per ticket; merges with the claim rename into one channel edit
+    party = [FakeUser(f'party{i}') for i in range(5)]
+    results.append((await Phase('.add 5 members').run(app.add_user.callback(ctx, targets=party) for ctx in contexts)).report())
+    while app.channel_edits._workers:
+        await asyncio.sleep(0.05)
+
+    # 4. .stats in every guild
+    stats_contexts = [FakeContext(g, staff, g.get_channel(opened[0].channel_id) or g.text_channels[0]) for g in guilds]
+    results.append((await Phase('.stats').run(app.stats.callback(ctx) for ctx in stats_contexts)).report())
+    await app.db.flush()
+    results.append((await Phase('.stats 7d').run(app.stats.callback(ctx, '7d') for ctx in stats_contexts)).report())
+
+    # 5. Close everything and wait until every channel is gone
+    started = time.perf_counter()
+    closes = [app.close_ticket(ctx.channel, staff) for ctx in contexts]
+    results.append((await Phase('close_ticket').run(closes)).report())
+    while len(app.deletions) or app.deletions._running:
+        await asyncio.sleep(0.05)
+    drained = time.perf_counter() - started
+
+    await app.deletions.close()
+    for worker in list(app.channel_edits._workers.values()):
+        worker.cancel()
+    await app.db.close()
+
+    mongo = app.db.client[app.db.name]
+    return {
+        'phases': results,
+        'close_to_deleted_seconds': round(drained, 3),
+        'tickets_left': len(app.tickets),
+        'rest_calls': dict(sorted(rest.calls.items())),
+        'rest_429s': dict(sorted(rest.ratelimited.items())),
+        'mongo_ops': {name: dict(c.ops) for name, c in sorted(mongo.items())},
+        'mongo_writes_coalesced': app.db.writes_coalesced,
+        'peak_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def print_report(report):
+    print(f"{'phase':<26}{'ops':>7}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for phase in report['phases']:
+        print(f"{phase['phase']:<26}{phase['ops']:>7}{phase['ops_per_second']:>10}"
+              f"{phase['p50_ms']:>10}{phase['p99_ms']:>10}")
+        if 'extra_tickets' in phase:
+            print(f"{'':<26}extra tickets opened: {phase['extra_tickets']}")
+    print(f"\nclose -> all channels deleted: {report['close_to_deleted_seconds']}s, tickets left: {report['tickets_left']}")
+    print('\nREST calls per route:')
+    for route, count in report['rest_calls'].items():
+        limited = report['rest_429s'].get(route, 0)
+        print(f'  {count:>7}  {route}' + (f'  ({limited} x 429)' if limited else ''))
+    print('\nMongoDB operations:')
+    for collection, ops in report['mongo_ops'].items():
+        print(f'  {collection:<16} {ops}')
+    print(f"  writes coalesced: {report['mongo_writes_coalesced']}")
+    print(f"\npeak RSS: {report['peak_rss_mib']} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clicks', type=int, default=1000)
+    parser.add_argument('--guilds', type=int, default=200)
+    parser.add_argument('--types', type=int, default=3, help='ticket types per guild')
+    parser.add_argument('--spam', type=int, default=5, help='repeat clicks per user in the spam phase')
+    parser.add_argument('--latency', type=float, default=50, help='simulated REST latency in ms')
+    parser.add_argument('--jitter', type=float, default=20, help='REST latency jitter in ms')
+    parser.add_argument('--ratelimit-rate', type=float, default=0.01, help='share of REST calls answered with 429')
+    parser.add_argument('--mongo-latency', type=float, default=2, help='simulated MongoDB latency in ms')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    # The bot logs through the queue listener as in production, but to
+    # /dev/null so its records don't drown the report
+    devnull = open(os.devnull, 'w')
+    listener = logs.setup(stream=devnull)
+    try:
+        report = asyncio.run(benchmark(args))
+    finally:
+        listener.stop()
+        devnull.close()
+        shutil.rmtree(TRANSCRIPT_DIR, ignore_errors=True)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+"""In-process stand-ins for Discord and MongoDB used by the benchmarks.
+
+They implement only what bot.py touches. Every REST-like call goes through
+``FakeREST``, which adds configurable latency and simulated 429s (retried
+the way discord.py does) and counts calls per route.
+"""
+import asyncio
+import itertools
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import discord
+
+_ids = itertools.count()
+
+
+def snowflake():
+    # Time-based like real ids, so snowflake_time() works on them
+    return discord.utils.time_snowflake(datetime.now(timezone.utc)) + (next(_ids) & 0x3FFFFF)
+
+
+class FakeREST:
+    def __init__(self, latency=0.05, jitter=0.02, ratelimit_rate=0.0, retry_after=0.5, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.ratelimit_rate = ratelimit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.ratelimited = Counter()
+
+    async def call(self, route):
+        self.calls[route] += 1
+        while self.random.random() < self.ratelimit_rate:
+            self.ratelimited[route] += 1
+            await asyncio.sleep(self.retry_after)
+        await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+
+class FakeAsset:
+    url = 'https://cdn.discordapp.com/embed/avatars/0.png'
+
+
+class FakeUser:
+    def __init__(self, name, id=None, bot=False):
+        self.id = id or snowflake()
+        self.name = name
+        self.bot = bot
+        self.display_avatar = FakeAsset()
+        self.guild_permissions = discord.Permissions.none()
+
+    @property
+    def mention(self):
+        return f'<@{self.id}>'
+
+    def __str__(self):
+        return self.name
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __eq__(self, other):
+        return getattr(other, 'id', None) == self.id
+
+
+class FakeRole(FakeUser):
+    @property
+    def mention(self):
+        return f'<@&{self.id}>'
+
+
+class FakeMessage:
+    __slots__ = ('id', 'author', 'content', 'created_at', 'edited_at', 'attachments', 'embeds')
+
+    def __init__(self, author, content, embeds=()):
+        self.id = snowflake()
+        self.author = author
+        self.content = content or ''
+        self.created_at = datetime.now(timezone.utc)
+        self.edited_at = None
+        self.attachments = []
+        self.embeds = list(embeds)
+
+
+class FakeChannel:
+    def __init__(self, guild, name, category=None, overwrites=None):
+        self.id = snowflake()
+        self.guild = guild
+        self.name = name
+        self.category = category
+        self.category_id = category.id if category else None
+        self.overwrites = dict(overwrites or {})
+        self.created_at = datetime.now(timezone.utc)
+        self.messages = []
+        self.last_message_id = None
+        self.last_message = None
+        self.deleted = False
+
+    @property
+    def mention(self):
+        return f'<#{self.id}>'
+
+    async def send(self, content=None, *, embed=None, embeds=None, view=None, files=None, allowed_mentions=None):
+        await self.guild.rest.call('POST /channels/{channel_id}/messages')
+        message = FakeMessage(self.guild.me, content, [embed] if embed else embeds or ())
+        self.messages.append(message)
+        self.last_message_id = message.id
+        self.last_message = message
+        return message
+
+    async def edit(self, **fields):
+        await self.guild.rest.call('PATCH /channels/{channel_id}')
+        if 'name' in fields:
+            self.name = fields['name']
+        if 'overwrites' in fields:
+            self.overwrites = dict(fields['overwrites'])
+
+    async def set_permissions(self, target, *, overwrite=discord.utils.MISSING, **permissions):
+        await self.guild.rest.call('PUT /channels/{channel_id}/permissions/{overwrite_id}')
+        if overwrite is None:
+            self.overwrites.pop(target, None)
+        else:
+            self.overwrites[target] = discord.PermissionOverwrite(**permissions)
+
+    async def delete(self, reason=None):
+        await self.guild.rest.call('DELETE /channels/{channel_id}')
+        self.deleted = True
+        self.guild.remove_channel(self)
+
+    async def history(self, limit=None, oldest_first=True):
+        for start in range(0, len(self.messages), 100):
+            await self.guild.rest.call('GET /channels/{channel_id}/messages')
+            for message in self.messages[start:start + 100]:
+                yield message
+
+
+class FakeCategory(FakeChannel):
+    pass
+
+
+class FakeGuild:
+    def __init__(self, rest, name):
+        self.id = snowflake()
+        self.name = name
+        self.rest = rest
+        self.shard_id = 0
+        self.unavailable = False
+        self.me = FakeUser('TicketBot', bot=True)
+        self.default_role = FakeRole('@everyone', id=self.id)
+        self.roles = {self.default_role.id: self.default_role}
+        self._channels = {}
+
+    @property
+    def channels(self):
+        return list(self._channels.values())
+
+    @property
+    def categories(self):
+        return [c for c in self._channels.values() if isinstance(c, FakeCategory)]
+
+    @property
+    def text_channels(self):
+        return [c for c in self._channels.values() if not isinstance(c, FakeCategory)]
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    def get_role(self, role_id):
+        return self.roles.get(role_id)
+
+    def get_member(self, user_id):
+        # No member list; callers fall back to fetching or to discord.Object
+        return None
+
+    def add_role(self, name):
+        role = FakeRole(name)
+        self.roles[role.id] = role
+        return role
+
+    def remove_channel(self, channel):
+        self._channels.pop(channel.id, None)
+
+    async def create_category(self, name, **kwargs):
+        await self.rest.call('POST /guilds/{guild_id}/channels')
+        category = FakeCategory(self, name)
+        self._channels[category.id] = category
+        return category
+
+    async def create_text_channel(self, name, *, category=None, overwrites=None, **kwargs):
+        await self.rest.call('POST /guilds/{guild_id}/channels')
+        channel = FakeChannel(self, name, category, overwrites)
+        self._channels[channel.id] = channel
+        return channel
+
+
+class _Response:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    async def defer(self, ephemeral=False, thinking=False):
+        await self.interaction.guild.rest.call('POST /interactions/{interaction_id}/{interaction_token}/callback')
+        self.done = True
+
+    async def send_message(self, content=None, **kwargs):
+        await self.defer()
+
+    async def edit_message(self, **kwargs):
+        await self.defer()
+
+    def is_done(self):
+        return self.done
+
+
+class _Followup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        await self.interaction.guild.rest.call('POST /webhooks/{webhook_id}/{webhook_token}')
+        self.messages.append(content)
+
+
+class FakeInteraction:
+    def __init__(self, guild, user, channel=None, custom_id=None):
+        self.id = snowflake()
+        self.type = discord.InteractionType.component
+        self.data = {'component_type': discord.ComponentType.button.value, 'custom_id': custom_id}
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel_id = channel.id if channel else None
+        self.user = user
+        self.channel = channel
+        self.created_at = datetime.now(timezone.utc)
+        self.response = _Response(self)
+        self.followup = _Followup(self)
+
+
+class FakeContext:
+    """Enough of commands.Context to call a command's callback directly"""
+
+    def __init__(self, guild, author, channel):
+        self.guild = guild
+        self.author = author
+        self.channel = channel
+        self.replies = []
+
+    async def send(self, content=None, **kwargs):
+        message = await self.channel.send(content, **{k: v for k, v in kwargs.items() if k in ('embed', 'view')})
+        self.replies.append(message)
+        return message
+
+    async def reply(self, content=None, **kwargs):
+        return await self.send(content, **kwargs)
+
+
+class FakeCollection:
+    """Dictionary-backed collection: equality/``$in`` filters and the
+    ``$set``/``$unset``/``$setOnInsert``/``$inc``/``$min``/``$max`` operators
+    and whole-document replacements."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.docs = {}
+        self.lock = threading.Lock()
+        self.ops = Counter()
+
+    def _wait(self, op):
+        self.ops[op] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def find(self, query=None, projection=None):
+        self._wait('find')
+        with self.lock:
+            return [dict(doc) for doc in self.docs.values() if _matches(doc, query or {})]
+
+    def find_one(self, query, projection=None):
+        found = self.find(query)
+        return found[0] if found else None
+
+    def create_index(self, keys, **kwargs):
+        self._wait('create_index')
+        return keys if isinstance(keys, str) else '_'.join(k for k, _ in keys)
+
+    def bulk_write(self, requests, ordered=True):
+        self._wait('bulk_write')
+        with self.lock:
+            for request in requests:
+                kind = type(request).__name__
+                if kind == 'InsertOne':
+                    doc = dict(request._doc)
+                    doc.setdefault('_id', snowflake())
+                    self.docs[doc['_id']] = doc
+                elif kind == 'ReplaceOne':
+                    self._replace(request._filter, request._doc, request._upsert)
+                elif kind == 'DeleteOne':
+                    for key, doc in list(self.docs.items()):
+                        if _matches(doc, request._filter):
+                            del self.docs[key]
+                            break
+                else:
+                    self._update(request._filter, request._doc, request._upsert)
+
+    def _replace(self, query, replacement, upsert):
+        doc = next((d for d in self.docs.values() if _matches(d, query)), None)
+        if doc is None and not upsert:
+            return
+        new = dict(replacement)
+        new['_id'] = doc['_id'] if doc else new.get('_id', snowflake())
+        self.docs[new['_id']] = new
+
+    def _update(self, query, update, upsert):
+        doc = next((d for d in self.docs.values() if _matches(d, query)), None)
+        inserted = doc is None
+        if inserted:
+            if not upsert:
+                return
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            doc.setdefault('_id', snowflake())
+        for op, fields in update.items():
+            for path, value in fields.items():
+                # Dotted paths address nested documents
+                *parents, field = path.split('.')
+                target = doc
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                if op == '$set' or (op == '$setOnInsert' and inserted):
+                    target[field] = value
+                elif op == '$unset':
+                    target.pop(field, None)
+                elif op == '$inc':
+                    target[field] = target.get(field, 0) + value
+                elif op == '$max':
+                    target[field] = max(target.get(field, value), value)
+                elif op == '$min':
+                    target[field] = min(target.get(field, value), value)
+        self.docs[doc['_id']] = doc
+
+
+def _matches(doc, query):
+    for field, expected in query.items():
+        value = doc.get(field)
+        if isinstance(expected, dict) and '$in' in expected:
+            if value not in expected['$in']:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+class FakeDatabase(dict):
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    def __missing__(self, name):
+        collection = self[name] = FakeCollection(self.latency)
+        return collection
+
+    def command(self, *args, **kwargs):
+        return {'ok': 1}
+
+
+class FakeMongoClient:
+    def __init__(self, latency=0.002):
+        self.databases = {}
+        self.latency = latency
+
+    def __getitem__(self, name):
+        if name not in self.databases:
+            self.databases[name] = FakeDatabase(self.latency)
+        return self.databases[name]
+
+    def close(self):
+        pass
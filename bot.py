@@ -1,167 +1,535 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
 from discord.ui import Button, View
 import os
-from datetime import datetime
+import logging
+from datetime import datetime, timedelta, timezone
 import asyncio
-from flask import Flask
-from threading import Thread
-import pymongo
-from pymongo import MongoClient
-
-# Flask app for keeping bot alive on Render
-app = Flask('')
-
-@app.route('/')
-def home():
-    return "<h1 style='text-align:center; margin-top:50px; font-family:Arial;'>Bot is Active</h1>"
-
-def run():
-    app.run(host='0.0.0.0', port=5000)
-
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+import signal
+import time
+from database import Database
+from tickets import Ticket, TicketRegistry
+from categories import CategoryManager
+from channel_edits import ChannelEditQueue
+from deletions import DeletionScheduler
+from transcripts import TranscriptExporter
+import logs
+import metrics
+from metrics import timings, timed, BUTTON_SECONDS, COMMAND_SECONDS
+from antispam import CreationGuard, TicketRefused, parse_limit
+from health import HealthServer
+from sharding import ShardConfig
+from command_sync import CommandSync
+from members import MemberCache, ParticipantList
+from config_cache import ConfigCache
+from inactivity import InactivitySweeper, SAVE_INTERVAL
+from analytics import Analytics
+from assignment import AutoAssigner
+from lifecycle import Lifecycle, DEFERRED_READY_TIMEOUT, DRAIN_TIMEOUT, LOAD_RETRY, MAX_LOAD_RETRY
+from ticket_types import TicketTypes, EDITABLE_FIELDS, button_id, parse_button_id, parse_duration as parse_seconds
 
 # Bot Configuration
 PREFIX = '.'
 TICKET_CATEGORY = 'Tickets'
 LOG_CHANNEL = 'ticket-logs'
+CLOSE_DELAY = 5
+# Ticket creation limits as tickets/seconds, per user and per guild
+USER_TICKET_LIMIT = parse_limit(os.getenv('USER_TICKET_LIMIT', '3/600'))
+GUILD_TICKET_LIMIT = parse_limit(os.getenv('GUILD_TICKET_LIMIT', '30/60'))
+# Health/metrics server for Render and the orchestrator
+HEALTH_PORT = int(os.getenv('PORT', 5000))
+# Transcripts: 'discord' uploads to the log channel, 'disk' keeps them in TRANSCRIPT_DIR, 'gridfs' stores them in MongoDB
+TRANSCRIPT_STORAGE = os.getenv('TRANSCRIPT_STORAGE', 'discord')
+TRANSCRIPT_DIR = os.getenv('TRANSCRIPT_DIR', 'transcripts')
+TRANSCRIPT_HTML = os.getenv('TRANSCRIPT_HTML') == '1'
+# Slash commands only: drops the message content intent, prefix commands then only work after a mention
+APP_COMMANDS_ONLY = os.getenv('APP_COMMANDS_ONLY') == '1'
+COMMAND_HINT = '/' if APP_COMMANDS_ONLY else PREFIX
+# Idle tickets get a warning after their type's timeout and are closed INACTIVITY_GRACE later
+INACTIVITY_GRACE = timedelta(hours=12)
+# Assign new tickets to the least loaded online member of the ticket role and ping only them.
+# Needs the presences intent and the member cache, so it does nothing together with LOW_MEMORY.
+AUTO_ASSIGN = os.getenv('AUTO_ASSIGN') == '1'
+# Low-memory mode: no member list per guild, members are fetched when a command needs one
+LOW_MEMORY = os.getenv('LOW_MEMORY') == '1'
+# Level of the bot's own loggers, changeable at runtime with the loglevel command
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 
 # Bot Setup
+log = logging.getLogger(logs.APP_LOGGER)
 intents = discord.Intents.default()
-intents.message_content = True
+intents.message_content = not APP_COMMANDS_ONLY
 intents.members = True
-bot = commands.Bot(command_prefix=PREFIX, intents=intents, help_command=None)
-
-# MongoDB Connection
-MONGO_URL = os.getenv('MONGO_URL')
-if MONGO_URL:
-    try:
-        client = MongoClient(MONGO_URL)
-        db = client['discord_bot']
-        ticket_roles_db = db['ticket_roles']
-        print('✅ Connected to MongoDB')
-    except Exception as e:
-        print(f'❌ MongoDB connection failed: {e}')
-        ticket_roles_db = None
+intents.presences = AUTO_ASSIGN
+bot_options = {
+    'command_prefix': commands.when_mentioned if APP_COMMANDS_ONLY else PREFIX,
+    'intents': intents,
+    'help_command': None
+}
+if LOW_MEMORY:
+    bot_options['member_cache_flags'] = discord.MemberCacheFlags.none()
+    bot_options['chunk_guilds_at_startup'] = False
+# Sharding is set up by cluster.py through SHARD_COUNT/SHARD_IDS, or SHARDED=1 for one process
+shard_config = ShardConfig.from_env()
+if shard_config.sharded:
+    bot = commands.AutoShardedBot(**bot_options, **shard_config.bot_kwargs())
 else:
-    print('⚠️ No MongoDB URL found, data will not persist!')
-    ticket_roles_db = None
+    bot = commands.Bot(**bot_options)
+metrics.instrument_http(bot.http)
 
-# Storage
-active_tickets = {}
-claimed_tickets = {}
-ticket_roles = {}
+# MongoDB Connection (all access goes through the async Database wrapper)
+MONGO_URL = os.getenv('MONGO_URL')
+db = Database(MONGO_URL) if MONGO_URL else None
+
+def spawn(coro):
+    """Run a coroutine in the background, keeping a reference until it's done"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# Startup gate and shutdown drain
+lifecycle = Lifecycle()
+
+# Storage (tickets and claims are mirrored to MongoDB, keyed by channel id)
+tickets = TicketRegistry()
+categories = CategoryManager(TICKET_CATEGORY, LOG_CHANNEL)
+channel_edits = ChannelEditQueue()
+deletions = DeletionScheduler(bot, db)
+creation_guard = CreationGuard(USER_TICKET_LIMIT, GUILD_TICKET_LIMIT)
+transcripts = TranscriptExporter(TRANSCRIPT_DIR, TRANSCRIPT_STORAGE, TRANSCRIPT_HTML, db)
+health = HealthServer(bot, db, port=HEALTH_PORT, lifecycle=lifecycle)
+command_sync = CommandSync(bot.tree, db)
+analytics = Analytics(db)
+assigner = AutoAssigner()
+members = MemberCache()
+inactivity = InactivitySweeper(
+    INACTIVITY_GRACE.total_seconds(),
+    on_warn=lambda channel_id, remaining: warn_inactive(channel_id, remaining),
+    on_close=lambda channel_id, idle: close_inactive(channel_id, idle)
+)
+Participants = ParticipantList(members)
+# Per-guild role pings, kept in step with MongoDB and other instances
+ticket_roles = ConfigCache(db, 'ticket_roles', 'type', owns_guild=shard_config.owns_guild)
+# Per-guild ticket types (name, emoji, color, category, limits), same mechanism
+ticket_types = TicketTypes(db, owns_guild=shard_config.owns_guild)
+state_loaded = False
+background_tasks = set()
+reconciled_guilds = set()
 
 # Color Scheme
 COLORS = {
-    'partnership': 0x5865F2,
-    'middleman': 0xFEE75C,
-    'support': 0x57F287,
     'error': 0xED4245,
     'success': 0x57F287,
+    'warning': 0xFEE75C,
     'info': 0x5865F2
 }
 
-# Ticket Types
-TICKET_TYPES = {
-    'partnership': {
-        'name': 'Partnership',
-        'emoji': '🤝',
-        'color': COLORS['partnership'],
-        'description': 'Discuss partnership opportunities'
-    },
-    'middleman': {
-        'name': 'Middleman',
-        'emoji': '⚖️',
-        'color': COLORS['middleman'],
-        'description': 'Request middleman services'
-    },
-    'support': {
-        'name': 'Support',
-        'emoji': '🎫',
-        'color': COLORS['support'],
-        'description': 'Get help and support'
-    }
-}
-
 # Button Views
-class TicketButtons(View):
-    def __init__(self):
-        super().__init__(timeout=None)
+def ticket_panels(guild_id):
+    """Panel messages for the guild's ticket types, as (embed, view) pairs of up to 25 buttons.
+
+    The buttons have no callbacks of their own: every click goes through
+    ``dispatch_ticket_button`` by custom_id, so added or edited types need
+    no registered view per panel and no restart.
+    """
+    types = ticket_types.for_guild(guild_id)
+    panels = []
+    for start in range(0, len(types), 25):
+        embed = discord.Embed(color=COLORS['info'])
+        if start == 0:
+            embed.title = '🎫 Create a Ticket'
+            embed.description = 'Click the button below to create a ticket based on your needs.\n\n**Available Ticket Types:**'
+        view = View(timeout=None)
+        for ticket_type, info in types[start:start + 25]:
+            embed.add_field(name=f"{info['emoji'] or ''} {info['name']}".strip(), value=info['description'] or '\u200b', inline=True)
+            view.add_item(Button(label=info['name'], emoji=info['emoji'],
+                                 style=getattr(discord.ButtonStyle, info['style']), custom_id=button_id(ticket_type)))
+        # discord.py doesn't keep finished views around, the listener handles the clicks
+        view.stop()
+        panels.append((embed, view))
+    panels[-1][0].set_footer(text='Select a ticket type to get started')
+    panels[-1][0].timestamp = datetime.utcnow()
+    return panels
+
+def bind_interaction(interaction, **fields):
+    # Everything logged while handling the interaction carries who, where and its id
+    logs.bind(guild_id=interaction.guild_id, channel_id=interaction.channel_id,
+              user_id=interaction.user.id, correlation_id=str(interaction.id), **fields)
+
+@timed(BUTTON_SECONDS, 'ticket')
+async def ticket_button(interaction: discord.Interaction, ticket_type):
+    bind_interaction(interaction, ticket_type=ticket_type)
+    log.debug('Ticket button clicked')
+    await interaction.response.defer(ephemeral=True)
+    if not await lifecycle.wait_ready(DEFERRED_READY_TIMEOUT):
+        await interaction.followup.send('⏳ The bot is still starting up, try again in a few seconds.', ephemeral=True)
+        return
+    try:
+        channel = await create_ticket(interaction.guild, interaction.user, ticket_type)
+        await interaction.followup.send(f'✅ Ticket created! {channel.mention}', ephemeral=True)
+    except TicketRefused as e:
+        await interaction.followup.send(f'❌ {e}', ephemeral=True)
+    except discord.Forbidden:
+        await interaction.followup.send('❌ I don\'t have permission to create channels!', ephemeral=True)
+    except Exception as e:
+        await interaction.followup.send(f'❌ Error: {str(e)}', ephemeral=True)
 
-    @discord.ui.button(label='Partnership', emoji='🤝', style=discord.ButtonStyle.primary, custom_id='ticket_partnership')
-    async def partnership_button(self, interaction: discord.Interaction, button: Button):
-        await interaction.response.defer(ephemeral=True)
-        try:
-            await create_ticket(interaction.guild, interaction.user, 'partnership')
-            await interaction.followup.send('✅ Ticket created! Check the ticket channel.', ephemeral=True)
-        except discord.Forbidden:
-            await interaction.followup.send('❌ I don\'t have permission to create channels!', ephemeral=True)
-        except Exception as e:
-            await interaction.followup.send(f'❌ Error: {str(e)}', ephemeral=True)
-
-    @discord.ui.button(label='Middleman', emoji='⚖️', style=discord.ButtonStyle.secondary, custom_id='ticket_middleman')
-    async def middleman_button(self, interaction: discord.Interaction, button: Button):
-        await interaction.response.defer(ephemeral=True)
-        try:
-            await create_ticket(interaction.guild, interaction.user, 'middleman')
-            await interaction.followup.send('✅ Ticket created! Check the ticket channel.', ephemeral=True)
-        except discord.Forbidden:
-            await interaction.followup.send('❌ I don\'t have permission to create channels!', ephemeral=True)
-        except Exception as e:
-            await interaction.followup.send(f'❌ Error: {str(e)}', ephemeral=True)
-
-    @discord.ui.button(label='Support', emoji='🎫', style=discord.ButtonStyle.success, custom_id='ticket_support')
-    async def support_button(self, interaction: discord.Interaction, button: Button):
-        await interaction.response.defer(ephemeral=True)
-        try:
-            await create_ticket(interaction.guild, interaction.user, 'support')
-            await interaction.followup.send('✅ Ticket created! Check the ticket channel.', ephemeral=True)
-        except discord.Forbidden:
-            await interaction.followup.send('❌ I don\'t have permission to create channels!', ephemeral=True)
-        except Exception as e:
-            await interaction.followup.send(f'❌ Error: {str(e)}', ephemeral=True)
+class ConfirmView(View):
+    """One-off confirm/cancel prompt that only the command author can answer"""
+
+    def __init__(self, author):
+        super().__init__(timeout=60)
+        self.author = author
+        self.confirmed = None
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.author.id
+
+    @discord.ui.button(label='Confirm', style=discord.ButtonStyle.danger)
+    async def confirm_button(self, interaction: discord.Interaction, button: Button):
+        # Acknowledged right away (the confirmed work can take longer than Discord's 3 seconds);
+        # the caller reports the result with edit_original_response
+        await interaction.response.edit_message(content='⏳ Working on it...', view=None)
+        self.confirmed = interaction
+        self.stop()
+
+    @discord.ui.button(label='Cancel', style=discord.ButtonStyle.secondary)
+    async def cancel_button(self, interaction: discord.Interaction, button: Button):
+        await interaction.response.edit_message(content='❌ Cancelled.', embed=None, view=None)
+        self.stop()
 
 class CloseTicketView(View):
     def __init__(self):
         super().__init__(timeout=None)
 
     @discord.ui.button(label='Close Ticket', emoji='🔒', style=discord.ButtonStyle.danger, custom_id='confirm_close')
+    @timed(BUTTON_SECONDS, 'confirm_close')
     async def close_button(self, interaction: discord.Interaction, button: Button):
+        bind_interaction(interaction)
         await interaction.response.defer()
+        if not await lifecycle.wait_ready(DEFERRED_READY_TIMEOUT):
+            await interaction.followup.send('⏳ The bot is still starting up, try again in a few seconds.', ephemeral=True)
+            return
+        # The welcome and confirm messages keep their button during the close countdown
+        if interaction.channel.id not in tickets:
+            await interaction.followup.send('❌ This ticket is already closed.', ephemeral=True)
+            return
         await close_ticket(interaction.channel, interaction.user)
 
+# Metrics read at scrape time
+metrics.Gauge('discord_gateway_latency_seconds', 'Gateway heartbeat latency', callback=lambda: bot.latency)
+metrics.Gauge('discord_shard_latency_seconds', 'Heartbeat latency per shard', ['shard'],
+              callback=lambda: [((shard_id,), latency) for shard_id, latency in getattr(bot, 'latencies', [(0, bot.latency)])])
+metrics.Gauge('discord_shard_guilds', 'Guilds per shard', ['shard'],
+              callback=lambda: guilds_per_shard().items())
+metrics.Gauge('bot_ready', 'Whether startup finished loading state (1) or not (0)',
+              callback=lambda: int(lifecycle.ready))
+metrics.Gauge('bot_startup_seconds', 'Seconds from process start to ready',
+              callback=lambda: lifecycle.ready_after or 0.0)
+metrics.Gauge('ticket_work_in_flight', 'Ticket creates and closes running now',
+              callback=lambda: lifecycle.active)
+metrics.Gauge('tickets_open', 'Open tickets per guild', ['guild'],
+              callback=lambda: [((guild_id,), guild.open) for guild_id, guild in list(tickets.guilds())])
+metrics.Gauge('tickets_claimed', 'Claimed tickets per guild', ['guild'],
+              callback=lambda: [((guild_id,), guild.claimed) for guild_id, guild in list(tickets.guilds())])
+
+def guilds_per_shard():
+    counts = {}
+    for guild in bot.guilds:
+        counts[(guild.shard_id,)] = counts.get((guild.shard_id,), 0) + 1
+    return counts
+
+class StartingUp(commands.CheckFailure):
+    pass
+
+@bot.check
+async def startup_gate(ctx):
+    # Commands arriving during the warm-up wait for it briefly instead of seeing an empty registry
+    if not await lifecycle.wait_ready():
+        raise StartingUp('⏳ The bot is still starting up, try again in a few seconds.')
+    return True
+
+@bot.before_invoke
+async def start_command(ctx):
+    ctx.started_at = time.perf_counter()
+    logs.bind(guild_id=ctx.guild.id if ctx.guild else None, channel_id=ctx.channel.id,
+              user_id=ctx.author.id, correlation_id=str((ctx.interaction or ctx.message).id))
+
+@bot.after_invoke
+async def stop_command_timer(ctx):
+    started = getattr(ctx, 'started_at', None)
+    if started is not None:
+        COMMAND_SECONDS.labels(ctx.command.qualified_name).observe(time.perf_counter() - started)
+
 # Events
 @bot.event
 async def on_ready():
-    print(f'✅ Bot is online as {bot.user}')
-    print(f'📊 Serving {len(bot.guilds)} servers')
-    await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.watching, name='.help | Ticket System'))
+    log.info('Bot is online as %s (%.1fs after start)', bot.user, time.monotonic() - lifecycle.started)
+    log.info('Serving %d servers (%s)', len(bot.guilds), shard_config)
+    await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.watching, name=f'{COMMAND_HINT}help | Ticket System'))
+
+    # Ticket panels are dispatched by dispatch_ticket_button; the close button's view is
+    # registered once, on_ready fires again on every reconnect
+    if not bot.persistent_views:
+        bot.add_view(CloseTicketView())
+
+    # The first time, warm_up() loads the data in the background (retrying until it
+    # works). Reconnects pick up guilds that weren't cached before.
+    if lifecycle.ready:
+        spawn(resume_state())
+
+    # App commands are global, one process of a cluster is enough to sync them
+    if shard_config.cluster_id in (None, 0):
+        spawn(sync_commands())
+
+async def warm_up():
+    """Connect to MongoDB and load state while the gateway connects, then open the gate.
+
+    Without the state existing tickets can't be claimed or closed, so the
+    gate stays shut and both steps are retried with backoff until they work.
+    """
+    delay = LOAD_RETRY
+    while db and not state_loaded:
+        if not db.connected:
+            try:
+                await db.connect()
+                log.info('Connected to MongoDB')
+            except Exception as e:
+                log.error('MongoDB connection failed: %s', e)
+        await load_state()
+        if not state_loaded:
+            log.warning('Ticket state not loaded, retrying in %.0fs', delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_LOAD_RETRY)
+    await bot.wait_until_ready()
+    await reconcile_tickets()
+    deletions.start()
+    inactivity.start()
+    lifecycle.mark_ready()
+    log.info('Ready for tickets %.1fs after start', lifecycle.ready_after, extra={'startup_seconds': round(lifecycle.ready_after, 3)})
+
+async def resume_state():
+    await load_state()
+    await reconcile_tickets()
+
+async def shutdown(reason):
+    """Stop taking tickets, let running work finish, then disconnect (main() flushes the rest)"""
+    if lifecycle.stopping:
+        return
+    log.info('%s, draining ticket work', reason)
+    left = await lifecycle.drain()
+    # Welcome messages and other follow-ups of the drained work
+    pending = [task for task in background_tasks if task is not asyncio.current_task()]
+    if pending:
+        await asyncio.wait(pending, timeout=max(1.0, DRAIN_TIMEOUT - lifecycle.drained_in))
+    # Transcripts uploaded to the log channel need the connection
+    await transcripts.close(timeout=max(1.0, DRAIN_TIMEOUT - lifecycle.drained_in))
+    if left:
+        log.warning('Gave up waiting for %d ticket operations', left)
+    log.info('Ticket work drained in %.1fs', lifecycle.drained_in, extra={'drain_seconds': round(lifecycle.drained_in, 3)})
+    await bot.close()
+
+async def sync_commands():
+    try:
+        await command_sync.sync()
+    except discord.HTTPException as e:
+        log.error('App command sync failed: %s', e)
+
+@bot.listen('on_interaction')
+async def dispatch_ticket_button(interaction):
+    # Panel buttons (current and pre-configurable panels) carry their ticket type in the custom_id
+    if interaction.type is not discord.InteractionType.component:
+        return
+    ticket_type = parse_button_id(interaction.data.get('custom_id', ''))
+    if ticket_type is not None:
+        await ticket_button(interaction, ticket_type)
 
-    # Add persistent views
-    bot.add_view(TicketButtons())
-    bot.add_view(CloseTicketView())
-    
-    # Load data from MongoDB
-    if ticket_roles_db:
-        try:
-            for doc in ticket_roles_db.find():
-                guild_id = doc['guild_id']
-                ticket_type = doc['type']
-                role_id = doc['role_id']
-                
-                if guild_id not in ticket_roles:
-                    ticket_roles[guild_id] = {}
-                ticket_roles[guild_id][ticket_type] = role_id
-            print('✅ Loaded ticket roles from database')
-        except Exception as e:
-            print(f'❌ Error loading data: {e}')
+@bot.event
+async def on_guild_channel_create(channel):
+    categories.channel_created(channel)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    categories.channel_updated(before, after)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    categories.channel_deleted(channel)
+    # Ticket channels deleted by hand shouldn't linger in the database
+    if channel.id in tickets:
+        await forget_ticket(channel.id)
+
+@bot.listen('on_message')
+async def track_ticket_activity(message):
+    # Runs for every message, so only a dict lookup for non-ticket channels
+    if message.channel.id in inactivity and not message.author.bot:
+        inactivity.touch(message.channel.id)
+        await note_activity(message.channel.id, message.created_at)
+
+@bot.event
+async def on_member_update(before, after):
+    assigner.member_updated(before, after)
+
+@bot.event
+async def on_member_remove(member):
+    members.forget(member.guild.id, member.id)
+
+# Persistence
+async def load_state():
+    global state_loaded
+    if state_loaded or not (db and db.connected):
+        return
+
+    try:
+        await db.create_index('tickets', 'guild_id')
+        await db.create_index('tickets', 'user_id')
+        await db.create_index('ticket_roles', 'version')
+        await db.create_index('ticket_types', 'version')
+        await analytics.create_indexes()
+
+        # Loaded once; other processes of the cluster own the other guilds
+        await ticket_roles.load()
+        ticket_roles.start()
+        log.info('Loaded ticket roles from database')
+        await ticket_types.load()
+        ticket_types.start()
+        log.info('Loaded ticket types from database')
+
+        for doc in await db.find('tickets'):
+            if shard_config.owns_guild(doc['guild_id']):
+                ticket = tickets.add(Ticket.from_document(doc))
+                if ticket.claimed_by:
+                    assigner.claimed(ticket.guild_id, ticket.claimed_by)
+        log.info('Loaded %d tickets from database', len(tickets))
+
+        await deletions.load(shard_config.owns_guild)
+        if len(deletions):
+            log.info('Resuming %d scheduled channel deletions', len(deletions))
+        state_loaded = True
+    except Exception as e:
+        log.exception('Error loading data: %s', e)
+
+async def reconcile_tickets():
+    """Drop tickets whose channels were deleted while the bot was offline
+    and register ticket channels the registry doesn't know about yet.
+
+    Each guild is checked once; guilds that aren't cached yet are picked up
+    on a later on_ready.
+    """
+    if db and not state_loaded:
+        return
+
+    guilds = [g for g in bot.guilds if not g.unavailable and g.id not in reconciled_guilds]
+    stale = []
+    adopted = 0
+    for guild in guilds:
+        for channel_id in guild_tickets(guild.id):
+            channel = guild.get_channel(channel_id)
+            # The log channel was adopted by mistake before ticket names were checked
+            if channel is None or channel.name == categories.log_channel_name:
+                stale.append(channel_id)
+            elif channel_id not in inactivity:
+                track_inactivity(channel, tickets.get(channel_id))
+        for channel in guild.text_channels:
+            ticket_type = adoptable_type(channel)
+            if ticket_type:
+                await register_ticket(channel, None, ticket_type)
+                adopted += 1
+        reconciled_guilds.add(guild.id)
+
+    for channel_id in stale:
+        await forget_ticket(channel_id)
+    if stale:
+        log.info('Removed %d tickets whose channels no longer exist', len(stale))
+    if adopted:
+        log.info('Registered %d existing ticket channels', adopted)
+
+def guild_tickets(guild_id):
+    return list(tickets.guild(guild_id).by_channel)
+
+def adoptable_type(channel):
+    """Type of an unregistered channel named like a ticket (ticket-<user>-<type>[-claimed]),
+    None for anything else: the log channel, closed tickets waiting for deletion, other channels"""
+    if channel.id in tickets or channel.id in deletions or channel.name == categories.log_channel_name:
+        return None
+    ticket_type = ticket_type_from_name(channel.guild.id, channel.name)
+    if ticket_type is None:
+        return None
+    user = channel.name.removesuffix('-claimed')[:-len(ticket_type) - 1]
+    return ticket_type if user.startswith('ticket-') and len(user) > len('ticket-') else None
+
+def ticket_type_from_name(guild_id, name):
+    # Longest first, so 'vip-support' wins over 'support'
+    for ticket_type in sorted(ticket_types.keys(guild_id), key=len, reverse=True):
+        if name.endswith(f'-{ticket_type}') or name.endswith(f'-{ticket_type}-claimed'):
+            return ticket_type
+    return None
+
+async def register_ticket(channel, user, ticket_type, created_at=None):
+    ticket = tickets.add(Ticket(
+        channel.id,
+        channel.guild.id,
+        user.id if user else None,
+        ticket_type,
+        created_at or channel.created_at.replace(tzinfo=None)
+    ))
+    await save_ticket(channel.id, ticket.to_document())
+    track_inactivity(channel, ticket)
+    return ticket
+
+def type_timeout(guild_id, ticket_type):
+    info = ticket_types.get(guild_id, ticket_type)
+    return info['timeout'] if info else None
+
+def track_inactivity(channel, ticket):
+    inactivity.track(channel.id, type_timeout(channel.guild.id, ticket.type), last_activity(channel, ticket),
+                     epoch(ticket.warned_at) if ticket.warned_at else None)
+
+def last_activity(channel, ticket):
+    """Time a member last wrote in the ticket: as saved on the ticket, else from the
+    cached last message (no API call), else the channel's creation. The bot's own
+    welcome and warning messages don't count."""
+    if ticket.last_activity:
+        return epoch(ticket.last_activity)
+    message = channel.last_message
+    if message and not message.author.bot:
+        return message.created_at.timestamp()
+    return channel.created_at.timestamp()
+
+def epoch(naive_utc):
+    return naive_utc.replace(tzinfo=timezone.utc).timestamp()
+
+async def note_activity(channel_id, at):
+    ticket = tickets.get(channel_id)
+    if ticket is None:
+        return
+    at = at.replace(tzinfo=None)
+    # Saved at most every SAVE_INTERVAL, and right away when it cancels a warning
+    if ticket.warned_at or not ticket.last_activity or (at - ticket.last_activity).total_seconds() >= SAVE_INTERVAL:
+        ticket.last_activity = at
+        ticket.warned_at = None
+        await save_ticket(channel_id, {'last_activity': at, 'warned_at': None})
+
+async def save_ticket(channel_id, fields):
+    if db and db.connected:
+        await db.update('tickets', {'_id': channel_id}, {'$set': fields})
+
+async def forget_ticket(channel_id):
+    ticket = tickets.remove(channel_id)
+    if ticket and ticket.claimed_by:
+        assigner.released(ticket.guild_id, ticket.claimed_by)
+    channel_edits.forget(channel_id)
+    inactivity.forget(channel_id)
+    if db and db.connected:
+        await db.delete('tickets', {'_id': channel_id})
 
 # Help Command
-@bot.command(name='help')
+@bot.hybrid_command(name='help', description='Show the ticket commands')
+@commands.guild_only()
 async def help_command(ctx):
+    p = COMMAND_HINT
     embed = discord.Embed(
         title='🎫 Ticket System - Help',
         description='Professional ticket management system for your server',
@@ -169,17 +537,19 @@ async def help_command(ctx):
     )
     embed.add_field(
         name='📋 Ticket Commands',
-        value='```\n.new <type> - Create a new ticket\n.close - Close current ticket\n.claim - Claim a ticket\n.unclaim - Unclaim a ticket\n.add <user> - Add user to ticket\n.remove <user> - Remove user from ticket\n.rename <name> - Rename ticket channel```',
+        value=f'```\n{p}new <type> - Create a new ticket\n{p}close - Close current ticket\n{p}claim - Claim a ticket\n{p}unclaim - Unclaim a ticket\n{p}add <users/roles> - Add users or roles to ticket\n{p}remove <users/roles> - Remove users or roles from ticket\n{p}rename <name> - Rename ticket channel```',
         inline=False
     )
+    types = '\n'.join(f"{ticket_type} - {info['description'] or info['name']}"
+                      for ticket_type, info in ticket_types.for_guild(ctx.guild.id))
     embed.add_field(
         name='🏷️ Ticket Types',
-        value='```\npartnership - Partnership inquiries\nmiddleman - Middleman services\nsupport - General support```',
+        value=f'```\n{types[:1000]}```',
         inline=False
     )
     embed.add_field(
         name='⚙️ Setup Commands',
-        value='```\n.setup - Create ticket panel\n.stats - View ticket statistics\n.ticketrole <type> <role> - Set role pings\n.ticketroles - View role settings```',
+        value=f'```\n{p}setup - Create ticket panel\n{p}stats [period] - View ticket statistics, e.g. for 7d\n{p}ticketrole <type> <role> - Set role pings\n{p}ticketroles - View role settings\n{p}tickettype - List ticket types\n{p}tickettype add/set/remove - Edit ticket types\n{p}closeall - Close every ticket\n{p}closetype <type> - Close all tickets of a type\n{p}closeolder <age> - Close tickets older than e.g. 48h or 7d\n{p}timings - View ticket latency breakdown\n{p}loglevel [level] [logger] - View or change log levels```',
         inline=False
     )
     embed.set_footer(text=f'Requested by {ctx.author}', icon_url=ctx.author.display_avatar.url)
@@ -188,43 +558,52 @@ async def help_command(ctx):
     await ctx.reply(embed=embed)
 
 # Setup Command
-@bot.command(name='setup')
+@bot.hybrid_command(name='setup', description='Post the ticket panel in this channel')
+@commands.guild_only()
 @commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
 async def setup(ctx):
-    embed = discord.Embed(
-        title='🎫 Create a Ticket',
-        description='Click the button below to create a ticket based on your needs.\n\n**Available Ticket Types:**',
-        color=COLORS['info']
-    )
-    embed.add_field(name='🤝 Partnership', value='For partnership opportunities and collaborations', inline=True)
-    embed.add_field(name='⚖️ Middleman', value='For secure middleman services', inline=True)
-    embed.add_field(name='🎫 Support', value='For general help and support', inline=True)
-    embed.set_footer(text='Select a ticket type to get started')
-    embed.timestamp = datetime.utcnow()
-
-    await ctx.send(embed=embed, view=TicketButtons())
-    await ctx.reply('✅ Ticket panel created successfully!')
+    # Up to 25 buttons per message
+    for embed, view in ticket_panels(ctx.guild.id):
+        await ctx.channel.send(embed=embed, view=view)
+    await ctx.reply('✅ Ticket panel created successfully!', ephemeral=True)
 
 # New Ticket Command
-@bot.command(name='new')
+@bot.hybrid_command(name='new', description='Open a new ticket')
+@commands.guild_only()
 async def new_ticket(ctx, ticket_type: str = None):
-    if not ticket_type or ticket_type.lower() not in TICKET_TYPES:
-        await ctx.reply('❌ Invalid ticket type! Use: `partnership`, `middleman`, or `support`')
+    if not ticket_type or not ticket_types.get(ctx.guild.id, ticket_type.lower()):
+        await ctx.reply(f'❌ Invalid ticket type! Use: {type_list(ctx.guild.id)}')
         return
 
+    # Slash commands must be acknowledged within 3 seconds
+    await ctx.defer()
     try:
-        await create_ticket(ctx.guild, ctx.author, ticket_type.lower())
-        await ctx.reply('✅ Ticket created! Check the ticket channel.')
+        channel = await create_ticket(ctx.guild, ctx.author, ticket_type.lower())
+        await ctx.reply(f'✅ Ticket created! {channel.mention}')
+    except TicketRefused as e:
+        await ctx.reply(f'❌ {e}')
     except discord.Forbidden:
         await ctx.reply('❌ I don\'t have permission to create channels! Give me **Manage Channels** permission.')
     except Exception as e:
         await ctx.reply(f'❌ Error creating ticket: {str(e)}')
-        print(f'Ticket creation error: {e}')
+        log.error('Ticket creation error: %s', e)
+
+@new_ticket.autocomplete('ticket_type')
+async def ticket_type_autocomplete(interaction: discord.Interaction, current: str):
+    current = current.lower()
+    return [app_commands.Choice(name=info['name'], value=ticket_type)
+            for ticket_type, info in ticket_types.for_guild(interaction.guild_id)
+            if ticket_type.startswith(current) or info['name'].lower().startswith(current)][:25]
+
+def type_list(guild_id):
+    return ', '.join(f'`{ticket_type}`' for ticket_type in ticket_types.keys(guild_id))
 
 # Close Command
-@bot.command(name='close')
+@bot.hybrid_command(name='close', description='Close this ticket')
+@commands.guild_only()
 async def close_command(ctx):
-    if not ctx.channel.name.startswith('ticket-'):
+    if ctx.channel.id not in tickets:
         await ctx.reply('❌ This command can only be used in ticket channels!')
         return
 
@@ -247,17 +626,25 @@ async def close_command(ctx):
     await ctx.reply(embed=embed, view=view)
 
 # Claim Command
-@bot.command(name='claim')
+@bot.hybrid_command(name='claim', description='Claim this ticket')
+@commands.guild_only()
 async def claim(ctx):
-    if not ctx.channel.name.startswith('ticket-'):
+    if ctx.channel.id not in tickets:
         await ctx.reply('❌ This command can only be used in ticket channels!')
         return
 
-    if ctx.channel.id in claimed_tickets:
+    if tickets.get(ctx.channel.id).claimed_by:
         await ctx.reply('❌ This ticket is already claimed!')
         return
 
-    claimed_tickets[ctx.channel.id] = ctx.author.id
+    now = datetime.utcnow()
+    ticket = tickets.get(ctx.channel.id)
+    first_claim = ticket.first_claimed_at is None
+    tickets.claim(ctx.channel.id, ctx.author.id, now)
+    assigner.claimed(ctx.guild.id, ctx.author.id)
+    await save_ticket(ctx.channel.id, {'claimed_by': ctx.author.id, 'first_claimed_at': ticket.first_claimed_at})
+    await analytics.record('claim', ticket, ctx.author.id, now,
+                           now - ticket.created_at if first_claim and ticket.created_at else None)
 
     embed = discord.Embed(
         description=f'✅ Ticket claimed by {ctx.author.mention}',
@@ -266,25 +653,33 @@ async def claim(ctx):
     embed.timestamp = datetime.utcnow()
 
     await ctx.send(embed=embed)
-    await ctx.channel.edit(name=f"{ctx.channel.name}-claimed")
+    # Renames are rate limited, so queue it instead of waiting for Discord
+    name = channel_edits.name(ctx.channel)
+    if not name.endswith('-claimed'):
+        channel_edits.edit(ctx.channel, name=f'{name}-claimed')
 
 # Unclaim Command
-@bot.command(name='unclaim')
+@bot.hybrid_command(name='unclaim', description='Unclaim this ticket')
+@commands.guild_only()
 async def unclaim(ctx):
-    if not ctx.channel.name.startswith('ticket-'):
+    if ctx.channel.id not in tickets:
         await ctx.reply('❌ This command can only be used in ticket channels!')
         return
 
-    if ctx.channel.id not in claimed_tickets:
+    claimer = tickets.get(ctx.channel.id).claimed_by
+    if not claimer:
         await ctx.reply('❌ This ticket is not claimed!')
         return
 
-    claimer = claimed_tickets[ctx.channel.id]
     if claimer != ctx.author.id and not ctx.author.guild_permissions.administrator:
         await ctx.reply('❌ Only the claimer or an administrator can unclaim this ticket!')
         return
 
-    del claimed_tickets[ctx.channel.id]
+    ticket = tickets.unclaim(ctx.channel.id)
+    assigner.released(ctx.guild.id, claimer)
+    if db and db.connected:
+        await db.update('tickets', {'_id': ctx.channel.id}, {'$unset': {'claimed_by': ''}})
+    await analytics.record('unclaim', ticket, ctx.author.id)
 
     embed = discord.Embed(
         description=f'✅ Ticket unclaimed by {ctx.author.mention}',
@@ -293,24 +688,27 @@ async def unclaim(ctx):
     embed.timestamp = datetime.utcnow()
 
     await ctx.send(embed=embed)
-    new_name = ctx.channel.name.replace('-claimed', '')
-    await ctx.channel.edit(name=new_name)
+    new_name = channel_edits.name(ctx.channel).replace('-claimed', '')
+    channel_edits.edit(ctx.channel, name=new_name)
 
 # Add User Command
-@bot.command(name='add')
-async def add_user(ctx, member: discord.Member = None):
-    if not ctx.channel.name.startswith('ticket-'):
+@bot.hybrid_command(name='add', description='Add members or roles to this ticket')
+@app_commands.describe(targets='Members and roles to add, e.g. @alice @bob @Staff')
+@commands.guild_only()
+async def add_user(ctx, *, targets: Participants = None):
+    if ctx.channel.id not in tickets:
         await ctx.reply('❌ This command can only be used in ticket channels!')
         return
 
-    if not member:
-        await ctx.reply('❌ Please mention a valid user!')
+    if not targets:
+        await ctx.reply('❌ Please mention the users or roles to add!')
         return
 
-    await ctx.channel.set_permissions(member, view_channel=True, send_messages=True, read_message_history=True)
+    # Everyone in one channel edit, merged with the current overwrites (and any queued rename)
+    channel_edits.edit(ctx.channel, overwrites={target: participant_overwrite() for target in targets})
 
     embed = discord.Embed(
-        description=f'✅ {member.mention} has been added to the ticket',
+        description=f'✅ {mention_list(targets)} {"has" if len(targets) == 1 else "have"} been added to the ticket',
         color=COLORS['success']
     )
     embed.timestamp = datetime.utcnow()
@@ -318,30 +716,40 @@ async def add_user(ctx, member: discord.Member = None):
     await ctx.reply(embed=embed)
 
 # Remove User Command
-@bot.command(name='remove')
-async def remove_user(ctx, member: discord.Member = None):
-    if not ctx.channel.name.startswith('ticket-'):
+@bot.hybrid_command(name='remove', description='Remove members or roles from this ticket')
+@app_commands.describe(targets='Members and roles to remove, e.g. @alice @bob')
+@commands.guild_only()
+async def remove_user(ctx, *, targets: Participants = None):
+    if ctx.channel.id not in tickets:
         await ctx.reply('❌ This command can only be used in ticket channels!')
         return
 
-    if not member:
-        await ctx.reply('❌ Please mention a valid user!')
+    targets = [target for target in targets or () if target != ctx.guild.me]
+    if not targets:
+        await ctx.reply('❌ Please mention the users or roles to remove!')
         return
 
-    await ctx.channel.set_permissions(member, overwrite=None)
+    channel_edits.edit(ctx.channel, overwrites={target: None for target in targets})
 
     embed = discord.Embed(
-        description=f'✅ {member.mention} has been removed from the ticket',
+        description=f'✅ {mention_list(targets)} {"has" if len(targets) == 1 else "have"} been removed from the ticket',
         color=COLORS['success']
     )
     embed.timestamp = datetime.utcnow()
 
     await ctx.reply(embed=embed)
 
+def participant_overwrite():
+    return discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True)
+
+def mention_list(targets):
+    return ', '.join(target.mention for target in targets)
+
 # Rename Command
-@bot.command(name='rename')
+@bot.hybrid_command(name='rename', description='Rename this ticket channel')
+@commands.guild_only()
 async def rename(ctx, *, new_name: str = None):
-    if not ctx.channel.name.startswith('ticket-'):
+    if ctx.channel.id not in tickets:
         await ctx.reply('❌ This command can only be used in ticket channels!')
         return
 
@@ -350,68 +758,218 @@ async def rename(ctx, *, new_name: str = None):
         return
 
     new_name = new_name.lower().replace(' ', '-')
-    await ctx.channel.edit(name=f'ticket-{new_name}')
+    channel_edits.edit(ctx.channel, name=f'ticket-{new_name}')
 
     embed = discord.Embed(
         description=f'✅ Ticket renamed to **ticket-{new_name}**',
         color=COLORS['success']
     )
+    eta = channel_edits.eta(ctx.channel)
+    if eta:
+        embed.set_footer(text=f'Discord limits channel renames, the new name applies in ~{int(eta // 60) + 1} min')
     embed.timestamp = datetime.utcnow()
 
     await ctx.reply(embed=embed)
 
 # Stats Command
-@bot.command(name='stats')
-async def stats(ctx):
-    tickets = [c for c in ctx.guild.channels if c.name.startswith('ticket-')]
-    claimed = [c for c in tickets if c.id in claimed_tickets]
+@bot.hybrid_command(name='stats', description='View ticket statistics')
+@commands.guild_only()
+async def stats(ctx, period: str = None):
+    """Live ticket counts, plus history from the rollups for a period like 24h or 7d"""
+    duration = parse_duration(period) if period else None
+    if period and not duration:
+        await ctx.reply('❌ Please provide a period like `24h`, `7d` or `30d`!')
+        return
+    counts = tickets.guild(ctx.guild.id)
 
     embed = discord.Embed(
         title='📊 Ticket Statistics',
         color=COLORS['info']
     )
-    embed.add_field(name='🎫 Active Tickets', value=f'`{len(tickets)}`', inline=True)
-    embed.add_field(name='✅ Claimed Tickets', value=f'`{len(claimed)}`', inline=True)
-    embed.add_field(name='⏳ Unclaimed Tickets', value=f'`{len(tickets) - len(claimed)}`', inline=True)
+    embed.add_field(name='🎫 Active Tickets', value=f'`{counts.open}`', inline=True)
+    embed.add_field(name='✅ Claimed Tickets', value=f'`{counts.claimed}`', inline=True)
+    embed.add_field(name='⏳ Unclaimed Tickets', value=f'`{counts.unclaimed}`', inline=True)
+    embed.add_field(name='✏️ Channel Edits', value=f'`{channel_edits.sent}` sent, `{channel_edits.saved}` saved', inline=True)
+    if duration:
+        if analytics.enabled:
+            add_history_fields(embed, ctx.guild, period, await analytics.summary(ctx.guild.id, duration))
+        else:
+            embed.add_field(name=f'📈 Last {period}', value='History needs MongoDB', inline=False)
     embed.set_footer(text=f'Requested by {ctx.author}', icon_url=ctx.author.display_avatar.url)
     embed.timestamp = datetime.utcnow()
 
     await ctx.reply(embed=embed)
 
+def add_history_fields(embed, guild, period, summary):
+    events = summary['events']
+    # The ten busiest types, removed ones included
+    names = {ticket_type: info['name'] for ticket_type, info in ticket_types.for_guild(guild.id)}
+    active = sorted({*events['open'], *events['close']} - {'all'},
+                    key=lambda t: -events['open'].get(t, 0) - events['close'].get(t, 0))[:10]
+    volume = '\n'.join(
+        f"{names.get(ticket_type, ticket_type.title())}: `{events['open'].get(ticket_type, 0)}` opened, `{events['close'].get(ticket_type, 0)}` closed"
+        for ticket_type in active
+    )
+    embed.add_field(
+        name=f'📈 Last {period}',
+        value=f"`{events['open'].get('all', 0)}` opened, `{events['claim'].get('all', 0)}` claimed, "
+              f"`{events['unclaim'].get('all', 0)}` unclaimed, `{events['close'].get('all', 0)}` closed\n"
+              f"Counted from {discord.utils.format_dt(summary['since'].replace(tzinfo=timezone.utc), 'f')}\n{volume}",
+        inline=False
+    )
+
+    def percentiles(values):
+        if values[0.5] is None:
+            return '`-`'
+        return f'p50 `{format_duration(values[0.5])}`, p90 `{format_duration(values[0.9])}`'
+
+    embed.add_field(name='⏱️ Time to Claim', value=percentiles(summary['time_to_claim']), inline=True)
+    embed.add_field(name='🔒 Time to Close', value=percentiles(summary['time_to_close']), inline=True)
+
+    top = sorted(summary['staff'].items(), key=lambda item: -item[1].get('claim', 0))[:5]
+    if top:
+        embed.add_field(
+            name='👥 Top Staff',
+            value='\n'.join(f"<@{user_id}>: `{counts.get('claim', 0)}` claimed, `{counts.get('close', 0)}` closed"
+                            for user_id, counts in top),
+            inline=False
+        )
+
+# Bulk Close Commands
+async def bulk_close(ctx, selected, reason):
+    if not selected:
+        await ctx.reply('❌ No tickets match!')
+        return
+
+    embed = discord.Embed(
+        title='⚠️ Close Tickets',
+        description=f'Are you sure you want to close **{len(selected)}** tickets ({reason})?',
+        color=COLORS['error']
+    )
+    embed.set_footer(text='This action cannot be undone')
+
+    view = ConfirmView(ctx.author)
+    message = await ctx.reply(embed=embed, view=view)
+    if await view.wait():
+        await message.edit(content='❌ Timed out.', embed=None, view=None)
+        return
+    if not view.confirmed:
+        return
+
+    # Tickets may have been closed while we waited
+    selected = [t for t in selected if t.channel_id in tickets]
+    await close_tickets(ctx.guild, selected, ctx.author, reason)
+
+    embed = discord.Embed(
+        description=f'✅ Closed **{len(selected)}** tickets, channels are being deleted',
+        color=COLORS['success']
+    )
+    embed.timestamp = datetime.utcnow()
+    await view.confirmed.edit_original_response(content=None, embed=embed, view=None)
+
+@bot.hybrid_command(name='closeall', description='Close every ticket in this server')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
+async def close_all(ctx):
+    selected = tickets.guild(ctx.guild.id).by_channel.values()
+    await bulk_close(ctx, list(selected), 'all tickets')
+
+@bot.hybrid_command(name='closetype', description='Close all tickets of a type')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
+async def close_type(ctx, ticket_type: str = None):
+    ticket_type = ticket_type.lower() if ticket_type else None
+    selected = [t for t in tickets.guild(ctx.guild.id).by_channel.values() if t.type == ticket_type]
+    # Tickets of a removed type can still be closed
+    if not ticket_type or not (selected or ticket_types.get(ctx.guild.id, ticket_type)):
+        await ctx.reply(f'❌ Invalid ticket type! Use: {type_list(ctx.guild.id)}')
+        return
+
+    await bulk_close(ctx, selected, f'type {ticket_type}')
+
+close_type.autocomplete('ticket_type')(ticket_type_autocomplete)
+
+@bot.hybrid_command(name='closeolder', description='Close tickets older than an age like 48h or 7d')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
+async def close_older(ctx, age: str = None):
+    duration = parse_duration(age) if age else None
+    if not duration:
+        await ctx.reply('❌ Please provide an age like `30m`, `48h` or `7d`!')
+        return
+
+    cutoff = datetime.utcnow() - duration
+    selected = [t for t in tickets.guild(ctx.guild.id).by_channel.values()
+                if t.created_at and t.created_at < cutoff]
+    await bulk_close(ctx, selected, f'older than {age}')
+
+# Latency Command
+@bot.hybrid_command(name='timings', description='View the ticket latency breakdown')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
+async def timings_command(ctx):
+    embed = discord.Embed(
+        title='⏱️ Ticket Timings',
+        color=COLORS['info']
+    )
+    lines = []
+    for name, timing in timings.items():
+        lines.append(f'{name:<28} n={timing.count:<6} p50={timing.percentile(0.5) * 1000:.0f}ms p99={timing.percentile(0.99) * 1000:.0f}ms')
+    embed.description = '```\n' + ('\n'.join(lines) or 'No samples yet') + '```'
+    embed.timestamp = datetime.utcnow()
+
+    await ctx.reply(embed=embed)
+
+# Logging Command
+@bot.hybrid_command(name='loglevel', description='View or change the log level')
+@commands.guild_only()
+@commands.is_owner()
+@app_commands.default_permissions(administrator=True)
+async def log_level(ctx, level: str = None, logger: str = logs.APP_LOGGER):
+    """Levels apply to the whole process, so only the bot owner can change them"""
+    if level:
+        try:
+            logs.set_level(logger, level)
+        except ValueError as e:
+            return await ctx.reply(f'❌ {e}')
+        log.warning('Log level of %s set to %s', logger, level.upper())
+
+    embed = discord.Embed(
+        title='📝 Log Levels',
+        description='\n'.join(f'`{name}`: {value}' for name, value in logs.levels(logger).items()),
+        color=COLORS['info']
+    )
+    embed.set_footer(text=f'{COMMAND_HINT}loglevel <level> [logger] to change, e.g. DEBUG or INFO')
+    await ctx.reply(embed=embed)
+
+@log_level.autocomplete('level')
+async def log_level_autocomplete(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=level, value=level) for level in logs.LEVELS if level.startswith(current.upper())]
+
 # Ticket role setup command
-@bot.command(name='ticketrole')
+@bot.hybrid_command(name='ticketrole', description='Set which role gets pinged for a ticket type')
+@commands.guild_only()
 @commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
 async def ticket_role(ctx, ticket_type: str, role: discord.Role):
     """Set which role gets pinged for each ticket type"""
     ticket_type = ticket_type.lower()
     
-    if ticket_type not in ['partnership', 'middleman', 'support']:
+    if not ticket_types.get(ctx.guild.id, ticket_type):
         embed = discord.Embed(
             title='❌ Invalid Ticket Type',
-            description='Valid types: `partnership`, `middleman`, `support`',
+            description=f'Valid types: {type_list(ctx.guild.id)}',
             color=COLORS['error']
         )
         return await ctx.send(embed=embed)
     
-    guild_id = str(ctx.guild.id)
-    
-    # Save to MongoDB
-    if ticket_roles_db:
-        try:
-            ticket_roles_db.update_one(
-                {'guild_id': guild_id, 'type': ticket_type},
-                {'$set': {'guild_id': guild_id, 'type': ticket_type, 'role_id': role.id}},
-                upsert=True
-            )
-            print(f'✅ Saved {ticket_type} role to MongoDB')
-        except Exception as e:
-            print(f'❌ Error saving to MongoDB: {e}')
-    
-    # Save to memory
-    if guild_id not in ticket_roles:
-        ticket_roles[guild_id] = {}
-    ticket_roles[guild_id][ticket_type] = role.id
-    
+    # Applied here right away, queued for MongoDB and picked up by other instances from there
+    await ticket_roles.set(ctx.guild.id, ticket_type, {'role_id': role.id})
+
     embed = discord.Embed(
         title='✅ Ticket Role Set',
         description=f'**{ticket_type.title()}** tickets will now ping {role.mention}',
@@ -419,23 +977,27 @@ async def ticket_role(ctx, ticket_type: str, role: discord.Role):
     )
     await ctx.send(embed=embed)
 
+ticket_role.autocomplete('ticket_type')(ticket_type_autocomplete)
+
 # View ticket role settings
-@bot.command(name='ticketroles')
+@bot.hybrid_command(name='ticketroles', description='View ticket role settings')
+@commands.guild_only()
 @commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
 async def ticket_roles_list(ctx):
     """View current ticket role settings"""
-    guild_id = str(ctx.guild.id)
+    settings = ticket_roles.guild(ctx.guild.id)
     
     embed = discord.Embed(
         title='🎫 Ticket Role Settings',
         color=COLORS['info']
     )
     
-    if guild_id not in ticket_roles or not ticket_roles[guild_id]:
-        embed.description = 'No ticket roles configured yet.\n\nUse `.ticketrole <type> <role>` to set them.'
+    if not settings:
+        embed.description = f'No ticket roles configured yet.\n\nUse `{COMMAND_HINT}ticketrole <type> <role>` to set them.'
     else:
-        for ticket_type, role_id in ticket_roles[guild_id].items():
-            role = ctx.guild.get_role(role_id)
+        for ticket_type, setting in settings.items():
+            role = ctx.guild.get_role(setting['role_id'])
             if role:
                 embed.add_field(
                     name=f'{ticket_type.title()} Tickets',
@@ -445,20 +1007,125 @@ async def ticket_roles_list(ctx):
     
     await ctx.send(embed=embed)
 
+# Ticket type commands
+@bot.hybrid_group(name='tickettype', description='Manage the ticket types of this server', fallback='list')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
+async def ticket_type_list(ctx):
+    """List the ticket types in panel order"""
+    lines = []
+    for ticket_type, info in ticket_types.for_guild(ctx.guild.id):
+        details = [f"limit {info['limit']}"]
+        if info['timeout']:
+            details.append(f"closes after {format_duration(info['timeout'])} idle")
+        if info['category']:
+            details.append(f"in {info['category']}")
+        if info['participants']:
+            details.append(f"adds {' '.join(info['participants'])}")
+        lines.append(f"`{ticket_type}` {info['emoji'] or ''} **{info['name']}** - {', '.join(details)}")
+
+    embed = discord.Embed(
+        title='🏷️ Ticket Types',
+        description='\n'.join(lines)[:4000],
+        color=COLORS['info']
+    )
+    embed.set_footer(text=f'{COMMAND_HINT}tickettype set <type> <field> <value> to edit, {COMMAND_HINT}setup to post the panel again')
+    await ctx.send(embed=embed)
+
+@ticket_type_list.command(name='add', description='Add a ticket type')
+@commands.has_permissions(administrator=True)
+async def ticket_type_add(ctx, ticket_type: str, *, name: str):
+    try:
+        await ticket_types.add(ctx.guild.id, ticket_type, name)
+    except ValueError as e:
+        return await ctx.send(f'❌ {e}')
+
+    embed = discord.Embed(
+        title='✅ Ticket Type Added',
+        description=f'**{name}** (`{ticket_type.lower()}`) is available now. Run `{COMMAND_HINT}setup` again to add it to the panel.',
+        color=COLORS['success']
+    )
+    await ctx.send(embed=embed)
+
+@ticket_type_list.command(name='set', description='Change a field of a ticket type')
+@commands.has_permissions(administrator=True)
+async def ticket_type_set(ctx, ticket_type: str, field: str, *, value: str):
+    ticket_type, field = ticket_type.lower(), field.lower()
+    try:
+        await ticket_types.update(ctx.guild.id, ticket_type, field, value)
+    except ValueError as e:
+        return await ctx.send(f'❌ {e}')
+
+    embed = discord.Embed(
+        title='✅ Ticket Type Updated',
+        description=f'`{ticket_type}` {field} is now `{value}`',
+        color=COLORS['success']
+    )
+    await ctx.send(embed=embed)
+
+ticket_type_set.autocomplete('ticket_type')(ticket_type_autocomplete)
+
+@ticket_type_set.autocomplete('field')
+async def ticket_type_field_autocomplete(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=field, value=field) for field in EDITABLE_FIELDS if field.startswith(current.lower())]
+
+@ticket_type_list.command(name='remove', description='Remove a ticket type')
+@commands.has_permissions(administrator=True)
+async def ticket_type_remove(ctx, ticket_type: str):
+    ticket_type = ticket_type.lower()
+    try:
+        await ticket_types.remove(ctx.guild.id, ticket_type)
+    except ValueError as e:
+        return await ctx.send(f'❌ {e}')
+
+    # Open tickets of the type stay open, old panel buttons for it are refused
+    embed = discord.Embed(
+        title='✅ Ticket Type Removed',
+        description=f'`{ticket_type}` can no longer be opened. Run `{COMMAND_HINT}setup` again to update the panel.',
+        color=COLORS['success']
+    )
+    await ctx.send(embed=embed)
+
+ticket_type_remove.autocomplete('ticket_type')(ticket_type_autocomplete)
+
 # Helper function to create tickets
 async def create_ticket(guild, user, ticket_type):
+    """Create the ticket channel and return it as soon as it exists.
+
+    The welcome message (role ping, embed and close button in one message)
+    is sent in the background so the caller can acknowledge the user right away.
+    """
+    if lifecycle.stopping:
+        raise TicketRefused('The bot is restarting, try again in a minute.')
+    # Concurrent clicks for the same type queue up here and find the first ticket
+    with logs.context(ticket_type=ticket_type):
+        async with lifecycle.work(), creation_guard.lock(guild.id, user.id, ticket_type):
+            return await _create_ticket(guild, user, ticket_type)
+
+async def _create_ticket(guild, user, ticket_type):
+    ticket_info = ticket_types.get(guild.id, ticket_type)
+    if ticket_info is None:
+        raise TicketRefused('This ticket type no longer exists, ask an admin to post the panel again.')
+
+    existing = open_tickets(guild.id, user.id, ticket_type)
+    if len(existing) >= ticket_info['limit']:
+        opened = ', '.join(f'<#{t.channel_id}>' for t in existing)
+        raise TicketRefused(f"You already have an open {ticket_info['name']} ticket: {opened}", existing[0].channel_id)
+
+    wait = creation_guard.acquire(guild.id, user.id)
+    if wait:
+        opened = tickets.guild(guild.id).for_user(user.id)
+        hint = f' Your open tickets: {", ".join(f"<#{t.channel_id}>" for t in opened)}' if opened else ''
+        raise TicketRefused(f'You are opening tickets too quickly, try again in {int(wait) + 1}s.{hint}')
+
+    timer = timings.stages('create_ticket')
     try:
-        print(f'[DEBUG] Starting ticket creation for {user.name}')
-        ticket_info = TICKET_TYPES[ticket_type]
-        
-        # Find or create category
-        category = discord.utils.get(guild.categories, name=TICKET_CATEGORY)
-        if not category:
-            print(f'[DEBUG] Creating category: {TICKET_CATEGORY}')
-            category = await guild.create_category(TICKET_CATEGORY)
-            print(f'[DEBUG] Category created: {category.id}')
-        else:
-            print(f'[DEBUG] Found existing category: {category.id}')
+        # Reserve a slot in the least-full category of the type
+        category = await categories.acquire(guild, ticket_info['category'])
+        timer.mark('category')
+
+        assignee = pick_assignee(guild, ticket_type) if AUTO_ASSIGN else None
         
         # Create ticket channel with permissions that allow pinging everyone/roles
         overwrites = {
@@ -476,63 +1143,128 @@ async def create_ticket(guild, user, ticket_type):
                 manage_messages=True
             )
         }
+        # The type's preset participants and the assignee come in with the channel, no edits afterwards
+        for target in preset_participants(guild, ticket_info['participants']):
+            overwrites.setdefault(target, participant_overwrite())
+        if assignee:
+            overwrites[assignee] = participant_overwrite()
         
-        print(f'[DEBUG] Creating ticket channel...')
-        ticket_channel = await guild.create_text_channel(
-            name=f'ticket-{user.name}-{ticket_type}',
-            category=category,
-            overwrites=overwrites
-        )
-        print(f'[DEBUG] Ticket channel created: {ticket_channel.id}')
-        
-        active_tickets[ticket_channel.id] = {
-            'user_id': user.id,
-            'type': ticket_type,
-            'created_at': datetime.utcnow()
-        }
-        
-        # Get the role to ping based on ticket type
-        guild_id = str(guild.id)
-        role_to_ping = None
-        
-        if guild_id in ticket_roles and ticket_type in ticket_roles[guild_id]:
-            role_id = ticket_roles[guild_id][ticket_type]
-            role_to_ping = guild.get_role(role_id)
-        
-        # Send initial message with role ping
-        if role_to_ping:
-            ping_message = f"{role_to_ping.mention} - New {ticket_info['name']} ticket opened!"
-            await ticket_channel.send(ping_message, allowed_mentions=discord.AllowedMentions(roles=True))
-        
-        embed = discord.Embed(
-            title=f"{ticket_info['emoji']} {ticket_info['name']} Ticket",
-            description=f"Welcome {user.mention}!\n\n**Ticket Type:** {ticket_info['description']}\n\nOur team will be with you shortly. Please describe your inquiry in detail.",
-            color=ticket_info['color']
-        )
-        embed.add_field(
-            name='📌 Commands',
-            value='`.close` - Close this ticket\n`.claim` - Claim this ticket\n`.add <user>` - Add a user\n`.remove <user>` - Remove a user',
-            inline=False
-        )
-        embed.set_footer(text=f'Ticket created by {user}', icon_url=user.display_avatar.url)
-        embed.timestamp = datetime.utcnow()
+        try:
+            ticket_channel = await guild.create_text_channel(
+                name=f'ticket-{user.name}-{ticket_type}' + ('-claimed' if assignee else ''),
+                category=category,
+                overwrites=overwrites
+            )
+        except Exception:
+            categories.release(guild, category)
+            raise
+        categories.release(guild, category, ticket_channel)
+        timer.mark('channel')
         
-        await ticket_channel.send(content=user.mention, embed=embed, view=CloseTicketView())
-        print(f'[DEBUG] Ticket creation completed successfully!')
+        ticket = await register_ticket(ticket_channel, user, ticket_type, datetime.utcnow())
+        await analytics.record('open', ticket, user.id, ticket.created_at)
+        if assignee:
+            await assign_ticket(ticket, assignee)
+        spawn(send_welcome(ticket_channel, user, ticket_type, ticket_info, assignee))
+        timer.done('register')
+        log.info('Opened ticket #%s', ticket_channel.name, extra={'ticket_channel_id': ticket_channel.id})
+        return ticket_channel
         
     except discord.Forbidden as e:
-        print(f'[ERROR] Permission denied: {e}')
+        creation_guard.refund(guild.id, user.id)
+        log.error('Permission denied: %s', e)
         raise
     except Exception as e:
-        print(f'[ERROR] Ticket creation failed: {e}')
+        # Failed attempts don't count against the limits
+        creation_guard.refund(guild.id, user.id)
+        log.exception('Ticket creation failed: %s', e)
         raise
 
-async def close_ticket(channel, user):
-    ticket_data = active_tickets.get(channel.id)
+def preset_participants(guild, mentions):
+    targets = []
+    for mention in mentions:
+        target_id = int(mention.strip('<@&>'))
+        if mention.startswith('<@&'):
+            role = guild.get_role(target_id)
+            if role:
+                targets.append(role)
+        else:
+            # Overwrites only need the id, so members missing from the cache (LOW_MEMORY) aren't fetched
+            targets.append(guild.get_member(target_id) or discord.Object(target_id, type=discord.Member))
+    return targets
+
+def pick_assignee(guild, ticket_type):
+    setting = ticket_roles.get(guild.id, ticket_type)
+    role = guild.get_role(setting['role_id']) if setting else None
+    return assigner.pick(guild, role) if role else None
+
+async def assign_ticket(ticket, staff):
+    now = datetime.utcnow()
+    tickets.claim(ticket.channel_id, staff.id, now)
+    assigner.claimed(ticket.guild_id, staff.id)
+    await save_ticket(ticket.channel_id, {'claimed_by': staff.id, 'first_claimed_at': now})
+    await analytics.record('claim', ticket, staff.id, now, now - ticket.created_at)
+
+def open_tickets(guild_id, user_id, ticket_type):
+    return [ticket for ticket in tickets.guild(guild_id).for_user(user_id) if ticket.type == ticket_type]
+
+async def send_welcome(ticket_channel, user, ticket_type, ticket_info, assignee=None):
+    started = time.perf_counter()
+
+    # Get the role to ping based on ticket type (memory only, never waits on MongoDB);
+    # an assigned ticket pings only the assignee
+    role_to_ping = None
+    setting = ticket_roles.get(ticket_channel.guild.id, ticket_type)
+    if setting and not assignee:
+        role_to_ping = ticket_channel.guild.get_role(setting['role_id'])
+    
+    embed = discord.Embed(
+        title=f"{ticket_info['emoji'] or '🎫'} {ticket_info['name']} Ticket",
+        description=f"Welcome {user.mention}!\n\n**Ticket Type:** {ticket_info['description'] or ticket_info['name']}\n\nOur team will be with you shortly. Please describe your inquiry in detail.",
+        color=ticket_info['color']
+    )
+    embed.add_field(
+        name='📌 Commands',
+        value=f'`{COMMAND_HINT}close` - Close this ticket\n`{COMMAND_HINT}claim` - Claim this ticket\n`{COMMAND_HINT}add <users/roles>` - Add people\n`{COMMAND_HINT}remove <users/roles>` - Remove people',
+        inline=False
+    )
+    embed.set_footer(text=f'Ticket created by {user}', icon_url=user.display_avatar.url)
+    embed.timestamp = datetime.utcnow()
+
+    # One message carries the user mention, the role ping, the embed and the close button
+    content = user.mention
+    if assignee:
+        content += f" {assignee.mention} - New {ticket_info['name']} ticket assigned to you!"
+    elif role_to_ping:
+        content += f" {role_to_ping.mention} - New {ticket_info['name']} ticket opened!"
+    
+    try:
+        await ticket_channel.send(
+            content=content,
+            embed=embed,
+            view=CloseTicketView(),
+            allowed_mentions=discord.AllowedMentions(users=[user, assignee] if assignee else [user],
+                                                     roles=[role_to_ping] if role_to_ping else False)
+        )
+    except discord.HTTPException as e:
+        log.error('Welcome message in #%s failed: %s', ticket_channel.name, e)
+    timings.record('create_ticket.welcome', time.perf_counter() - started)
+
+async def close_ticket(channel, user, reason=None):
+    # Shutdown waits for closes that have started
+    async with lifecycle.work():
+        await _close_ticket(channel, user, reason)
+
+async def _close_ticket(channel, user, reason=None):
+    timer = timings.stages('close_ticket')
+    ticket = tickets.get(channel.id)
+    logs.bind(channel_id=channel.id, ticket_type=ticket.type if ticket else None)
+    # Out of the registry before the first await, so a second close can't start meanwhile
+    await forget_ticket(channel.id)
 
     embed = discord.Embed(
         title='🔒 Ticket Closed',
-        description=f'Ticket closed by {user.mention}',
+        description=f'Ticket closed by {user.mention}' + (f' ({reason})' if reason else ''),
         color=COLORS['error']
     )
     embed.timestamp = datetime.utcnow()
@@ -540,7 +1272,7 @@ async def close_ticket(channel, user):
     await channel.send(embed=embed)
 
     # Log to ticket-logs if exists
-    log_channel = discord.utils.get(channel.guild.channels, name=LOG_CHANNEL)
+    log_channel = categories.log_channel(channel.guild)
     if log_channel:
         log_embed = discord.Embed(
             title='🎫 Ticket Closed',
@@ -548,23 +1280,119 @@ async def close_ticket(channel, user):
         )
         log_embed.add_field(name='Channel', value=channel.name, inline=True)
         log_embed.add_field(name='Closed By', value=user.name, inline=True)
-        log_embed.add_field(name='Type', value=ticket_data.get('type', 'Unknown') if ticket_data else 'Unknown', inline=True)
+        log_embed.add_field(name='Type', value=(ticket.type if ticket else None) or 'Unknown', inline=True)
+        if reason:
+            log_embed.add_field(name='Reason', value=reason, inline=True)
         log_embed.timestamp = datetime.utcnow()
 
         await log_channel.send(embed=log_embed)
 
-    if channel.id in active_tickets:
-        del active_tickets[channel.id]
-    if channel.id in claimed_tickets:
-        del claimed_tickets[channel.id]
+    if ticket:
+        await record_close(ticket, user)
+
+    # Deleted in the background so restarts during the countdown don't orphan it,
+    # but not before the transcript export has read the whole history (the upload can come later)
+    export_transcript(channel, log_channel, ticket, user)
+    await deletions.schedule(channel.id, CLOSE_DELAY, channel.guild.id)
+    timer.done()
+    log.info('Closed ticket #%s', channel.name, extra={'closed_by': user.id, 'reason': reason})
+
+def export_transcript(channel, log_channel, ticket, user):
+    if deletions.held(channel.id):
+        return  # already being exported
+    metadata = {
+        'guild_id': channel.guild.id,
+        'channel_id': channel.id,
+        'type': ticket.type if ticket else None,
+        'user_id': ticket.user_id if ticket else None,
+        'closed_by': user.id
+    }
+    task = asyncio.create_task(transcripts.run(channel, log_channel, metadata))
+    deletions.hold(channel.id, task)
+
+async def record_close(ticket, user):
+    now = datetime.utcnow()
+    # Closes by the bot itself (inactivity) don't count for staff
+    await analytics.record('close', ticket, None if user.bot else user.id, now,
+                           now - ticket.created_at if ticket.created_at else None)
+
+async def close_tickets(guild, selected, user, reason):
+    """Close many tickets at once without per-channel messages"""
+    async with lifecycle.work():
+        await _close_tickets(guild, selected, user, reason)
+
+async def _close_tickets(guild, selected, user, reason):
+    log_channel = categories.log_channel(guild)
+    for ticket in selected:
+        channel = guild.get_channel(ticket.channel_id)
+        await forget_ticket(ticket.channel_id)
+        await record_close(ticket, user)
+        if channel:
+            export_transcript(channel, log_channel, ticket, user)
+        await deletions.schedule(ticket.channel_id, guild_id=guild.id)
 
-    await asyncio.sleep(5)
-    await channel.delete()
+    if log_channel:
+        log_embed = discord.Embed(
+            title='🎫 Tickets Closed',
+            description=f'{len(selected)} tickets closed ({reason})',
+            color=COLORS['error']
+        )
+        log_embed.add_field(name='Closed By', value=user.name, inline=True)
+        log_embed.timestamp = datetime.utcnow()
+        await log_channel.send(embed=log_embed)
+
+async def warn_inactive(channel_id, remaining):
+    logs.bind(channel_id=channel_id, correlation_id=logs.correlation_id())
+    ticket = tickets.get(channel_id)
+    if ticket:
+        # A restart resumes the countdown to the close instead of warning again
+        ticket.warned_at = datetime.utcnow()
+        await save_ticket(channel_id, {'warned_at': ticket.warned_at})
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        return
+    embed = discord.Embed(
+        title='⏰ Inactive Ticket',
+        description=f'This ticket has been inactive for a while and will be closed in **{format_duration(remaining)}**.\nSend a message to keep it open.',
+        color=COLORS['warning']
+    )
+    embed.timestamp = datetime.utcnow()
+    try:
+        await channel.send(embed=embed)
+    except discord.HTTPException as e:
+        log.error('Inactivity warning in #%s failed: %s', channel.name, e)
+
+async def close_inactive(channel_id, idle):
+    logs.bind(channel_id=channel_id, correlation_id=logs.correlation_id())
+    channel = bot.get_channel(channel_id)
+    if channel is None or channel_id not in tickets:
+        return
+    try:
+        await close_ticket(channel, channel.guild.me, f'inactive for {format_duration(idle)}')
+    except discord.HTTPException as e:
+        log.error('Closing inactive ticket #%s failed: %s', channel.name, e)
+
+def format_duration(seconds):
+    for unit, size in (('d', 86400), ('h', 3600), ('m', 60)):
+        if seconds >= size:
+            return f'{int(seconds // size)}{unit}'
+    return f'{int(seconds)}s'
+
+def parse_duration(text):
+    seconds = parse_seconds(text)
+    return timedelta(seconds=seconds) if seconds else None
 
 # Error Handling
 @bot.event
 async def on_command_error(ctx, error):
-    if isinstance(error, commands.MissingPermissions):
+    if isinstance(error, commands.HybridCommandError):
+        error = error.original
+    if isinstance(error, StartingUp):
+        try:
+            await ctx.reply(str(error))
+        except:
+            pass
+    elif isinstance(error, (commands.MissingPermissions, commands.NotOwner)):
         try:
             await ctx.reply('❌ You do not have permission to use this command!')
         except:
@@ -574,25 +1402,68 @@ async def on_command_error(ctx, error):
             await ctx.reply('❌ User not found!')
         except:
             pass
+    elif isinstance(error, commands.BadArgument):
+        try:
+            await ctx.reply(f'❌ {error}')
+        except:
+            pass
     elif isinstance(error, commands.CommandInvokeError):
         if 'Forbidden' in str(error):
-            print(f'Permission Error: Bot lacks permissions in {ctx.guild.name} - {ctx.channel.name}')
+            log.warning('Bot lacks permissions in %s - #%s', ctx.guild.name, ctx.channel.name)
             try:
                 await ctx.author.send(f'❌ I don\'t have permission to send messages in #{ctx.channel.name}. Please give me "Send Messages" and "Embed Links" permissions!')
             except:
                 pass
         else:
-            print(f'Error: {error}')
+            log.error('Command %s failed: %s', ctx.command, error, exc_info=error.original)
     else:
-        print(f'Error: {error}')
+        log.error('Command %s failed: %s', ctx.command, error)
 
 # Run Bot
+async def main(token):
+    async with bot:
+        # Our host sends SIGTERM before stopping the container
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, lambda sig=sig: spawn(shutdown(sig.name)))
+            except NotImplementedError:
+                pass  # Windows
+        # Served from the bot's own loop, no extra thread
+        await health.start()
+        if not db:
+            log.warning('No MongoDB URL found, data will not persist!')
+        # MongoDB and the caches warm up while the gateway connects
+        # (not in background_tasks, shutdown shouldn't wait for it)
+        warming = asyncio.create_task(warm_up())
+        try:
+            await bot.start(token)
+        finally:
+            stopped = time.monotonic()
+            warming.cancel()
+            await health.stop()
+            await ticket_roles.close()
+            await ticket_types.close()
+            await inactivity.close()
+            await deletions.close()
+            await transcripts.close()
+            # Flush queued writes before the process exits
+            if db:
+                await db.close()
+            log.info('State flushed %.1fs after disconnecting', time.monotonic() - stopped)
+
 if __name__ == '__main__':
-    keep_alive()
+    # JSON lines written by a background thread, for our records and discord.py's
+    listener = logs.setup(LOG_LEVEL)
     TOKEN = os.getenv('TOKEN')
-    if not TOKEN:
-        print('❌ ERROR: No TOKEN found in environment variables!')
-        print('Please set your Discord bot token as TOKEN environment variable')
-    else:
-        print('🚀 Starting Discord Ticket Bot...')
-        bot.run(TOKEN)
+    try:
+        if not TOKEN:
+            log.error('No TOKEN found in environment variables! Set your Discord bot token as the TOKEN environment variable')
+        else:
+            log.info('Starting Discord Ticket Bot...')
+            try:
+                asyncio.run(main(TOKEN))
+            except KeyboardInterrupt:
+                pass
+    finally:
+        listener.stop()
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+
+import discord
+
+log = logging.getLogger('ticketbot.categories')
+
+# Discord allows at most 50 channels in one category
+CATEGORY_LIMIT = 50
+# Create the next category once fewer free slots than this remain
+RESERVE = 5
+# Seconds an empty overflow category is kept before it is deleted
+CLEANUP_DELAY = 300
+
+
+class CategoryPool:
+    """Ticket categories of one guild (``Tickets``, ``Tickets-2``, ...).
+
+    Categories are kept in buckets by how many channels they hold, so the
+    least-full one is found without scanning. Slots handed out by
+    ``reserve`` count as used until the channel is confirmed or released,
+    which keeps bursts of concurrent creates from overfilling a category.
+    """
+
+    def __init__(self, base_name):
+        self.base_name = base_name
+        self.index = {}  # category id -> number in the name
+        self.channels = {}  # category id -> set of channel ids
+        self.reserved = {}
+        self.free = 0
+        self.creating = None
+        self.cleanup = None
+        self.fresh = {}  # categories created by us that aren't cached yet
+        self._counts = {}
+        self._buckets = [set() for _ in range(CATEGORY_LIMIT + 1)]
+        self._min = CATEGORY_LIMIT
+
+    def name_for(self, index):
+        return self.base_name if index == 1 else f'{self.base_name}-{index}'
+
+    def parse(self, name):
+        if name == self.base_name:
+            return 1
+        prefix = f'{self.base_name}-'
+        if name.startswith(prefix) and name[len(prefix):].isdigit():
+            return int(name[len(prefix):])
+        return None
+
+    def next_index(self):
+        used = set(self.index.values())
+        index = 1
+        while index in used:
+            index += 1
+        return index
+
+    def __contains__(self, category_id):
+        return category_id in self.index
+
+    def count(self, category_id):
+        return self._counts.get(category_id, 0)
+
+    def add_category(self, category_id, index, channel_ids=()):
+        if category_id in self.index:
+            return
+        self.index[category_id] = index
+        self.channels[category_id] = set(channel_ids)
+        self.reserved[category_id] = 0
+        self._counts[category_id] = 0
+        self._buckets[0].add(category_id)
+        self.free += CATEGORY_LIMIT
+        self._min = 0
+        self._refresh(category_id)
+
+    def remove_category(self, category_id):
+        if category_id not in self.index:
+            return
+        count = self._counts.pop(category_id)
+        self._buckets[count].discard(category_id)
+        self.free -= CATEGORY_LIMIT - count
+        del self.index[category_id]
+        del self.channels[category_id]
+        del self.reserved[category_id]
+        self._advance()
+
+    def least_full(self):
+        """Category with the most free slots, or None if every one is full"""
+        self._advance()
+        if self._min >= CATEGORY_LIMIT:
+            return None
+        return next(iter(self._buckets[self._min]))
+
+    def reserve(self, category_id):
+        self.reserved[category_id] += 1
+        self._refresh(category_id)
+
+    def release(self, category_id, channel_id=None):
+        """Return a reserved slot, recording the channel that now uses it"""
+        if category_id not in self.index:
+            return
+        self.reserved[category_id] -= 1
+        if channel_id is not None:
+            self.channels[category_id].add(channel_id)
+        self._refresh(category_id)
+
+    def channel_added(self, category_id, channel_id):
+        if category_id in self.index:
+            self.channels[category_id].add(channel_id)
+            self._refresh(category_id)
+
+    def channel_removed(self, category_id, channel_id):
+        if category_id in self.index:
+            self.channels[category_id].discard(channel_id)
+            self._refresh(category_id)
+
+    def empty_overflow(self):
+        return [category_id for category_id, index in self.index.items()
+                if index > 1 and not self._counts[category_id]]
+
+    def _refresh(self, category_id):
+        old = self._counts[category_id]
+        new = min(len(self.channels[category_id]) + self.reserved[category_id], CATEGORY_LIMIT)
+        if new == old:
+            return
+        self._buckets[old].discard(category_id)
+        self._buckets[new].add(category_id)
+        self._counts[category_id] = new
+        self.free += old - new
+        if new < self._min:
+            self._min = new
+
+    def _advance(self):
+        while self._min < CATEGORY_LIMIT and not self._buckets[self._min]:
+            self._min += 1
+
+
+class CategoryManager:
+    """Per-guild category pools plus a cache of the log channel.
+
+    A guild has one pool per category name in use (``base_name`` unless a
+    ticket type asks for its own). Both are built from the guild cache on
+    first use and then kept in sync by the ``on_guild_channel_*`` events.
+    """
+
+    def __init__(self, base_name, log_channel_name):
+        self.base_name = base_name
+        self.log_channel_name = log_channel_name
+        self.pools = {}  # guild id -> {base name: pool}
+        self.log_channels = {}
+
+    def pool(self, guild, base_name=None):
+        base_name = base_name or self.base_name
+        pools = self.pools.setdefault(guild.id, {})
+        pool = pools.get(base_name)
+        if pool is None:
+            pool = CategoryPool(base_name)
+            by_category = {}
+            for channel in guild.channels:
+                if channel.category_id:
+                    by_category.setdefault(channel.category_id, []).append(channel.id)
+            for category in guild.categories:
+                index = pool.parse(category.name)
+                if index:
+                    pool.add_category(category.id, index, by_category.get(category.id, ()))
+            pools[base_name] = pool
+        return pool
+
+    def guild_pools(self, guild_id):
+        return self.pools.get(guild_id, {}).values()
+
+    async def acquire(self, guild, base_name=None):
+        """Reserve a slot in the least-full category of ``base_name`` (the
+        default ticket category if None), creating one if needed.
+
+        The caller must ``release`` the slot once the channel exists (or failed).
+        """
+        pool = self.pool(guild, base_name)
+        category_id = pool.least_full()
+        while category_id is None:
+            await self._grow(guild, pool)
+            category_id = pool.least_full()
+        category = guild.get_channel(category_id) or pool.fresh.get(category_id)
+        if category is None:
+            # Deleted behind our back; forget it and try again
+            pool.remove_category(category_id)
+            return await self.acquire(guild, base_name)
+
+        pool.reserve(category_id)
+        if pool.free < RESERVE and pool.creating is None:
+            # Create the next category ahead of demand
+            pool.creating = asyncio.create_task(self._create_category(guild, pool))
+            pool.creating.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return category
+
+    def release(self, guild, category, channel=None):
+        for pool in self.guild_pools(guild.id):
+            if category.id in pool:
+                pool.release(category.id, channel.id if channel else None)
+
+    async def _grow(self, guild, pool):
+        # Concurrent callers share a single create_category request
+        if pool.creating is None:
+            pool.creating = asyncio.create_task(self._create_category(guild, pool))
+        await asyncio.shield(pool.creating)
+
+    async def _create_category(self, guild, pool):
+        try:
+            category = await guild.create_category(pool.name_for(pool.next_index()))
+            pool.fresh[category.id] = category
+            pool.add_category(category.id, pool.parse(category.name))
+            log.info('Created ticket category %s', category.name)
+        except discord.HTTPException as e:
+            log.error('Could not create ticket category: %s', e)
+            raise
+        finally:
+            pool.creating = None
+
+    async def _cleanup(self, guild, pool):
+        await asyncio.sleep(CLEANUP_DELAY)
+        pool.cleanup = None
+        for category_id in pool.empty_overflow():
+            if pool.free - CATEGORY_LIMIT < RESERVE:
+                break
+            category = guild.get_channel(category_id)
+            pool.remove_category(category_id)
+            if category:
+                try:
+                    await category.delete(reason='Empty ticket overflow category')
+                except discord.HTTPException as e:
+                    log.error('Could not delete category %s: %s', category.name, e)
+
+    def log_channel(self, guild):
+        if guild.id not in self.log_channels:
+            channel = discord.utils.get(guild.channels, name=self.log_channel_name)
+            self.log_channels[guild.id] = channel.id if channel else None
+        channel_id = self.log_channels[guild.id]
+        return guild.get_channel(channel_id) if channel_id else None
+
+    # Gateway events
+    def channel_created(self, channel):
+        guild = channel.guild
+        if isinstance(channel, discord.TextChannel) and channel.name == self.log_channel_name:
+            self.log_channels.pop(guild.id, None)
+        for pool in self.guild_pools(guild.id):
+            if isinstance(channel, discord.CategoryChannel):
+                pool.fresh.pop(channel.id, None)
+                index = pool.parse(channel.name)
+                if index:
+                    pool.add_category(channel.id, index)
+            elif channel.category_id:
+                pool.channel_added(channel.category_id, channel.id)
+
+    def channel_deleted(self, channel):
+        guild = channel.guild
+        if self.log_channels.get(guild.id) == channel.id:
+            del self.log_channels[guild.id]
+        for pool in self.guild_pools(guild.id):
+            if isinstance(channel, discord.CategoryChannel):
+                pool.fresh.pop(channel.id, None)
+                pool.remove_category(channel.id)
+            elif channel.category_id in pool:
+                pool.channel_removed(channel.category_id, channel.id)
+                if pool.empty_overflow() and pool.cleanup is None:
+                    pool.cleanup = asyncio.create_task(self._cleanup(guild, pool))
+
+    def channel_updated(self, before, after):
+        if before.name != after.name and self.log_channel_name in (before.name, after.name):
+            self.log_channels.pop(after.guild.id, None)
+        for pool in self.guild_pools(after.guild.id):
+            if isinstance(after, discord.CategoryChannel):
+                if before.name != after.name:
+                    pool.remove_category(after.id)
+                    index = pool.parse(after.name)
+                    if index:
+                        pool.add_category(after.id, index, [c.id for c in after.channels])
+            elif before.category_id != after.category_id:
+                pool.channel_removed(before.category_id, after.id)
+                pool.channel_added(after.category_id, after.id)
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import discord
+
+log = logging.getLogger('ticketbot.channel_edits')
+
+# Discord allows 2 renames per channel every 10 minutes
+RENAME_LIMIT = 2
+RENAME_WINDOW = 600
+# Gather changes for this long before sending, so quick sequences merge
+DEBOUNCE = 1.0
+
+
+class PendingEdit:
+    __slots__ = ('name', 'overwrites', 'requests', 'sent')
+
+    def __init__(self):
+        self.name = None
+        self.overwrites = {}  # target -> PermissionOverwrite, None removes it
+        self.requests = 0
+        self.sent = 0
+
+
+class ChannelEditQueue:
+    """Per-channel queue that merges name and permission changes.
+
+    Only the latest desired state is kept. A background worker per channel
+    sends it as one ``channel.edit`` call, waiting for the rename budget when
+    the name changes, so commands can reply right away.
+    """
+
+    def __init__(self, debounce=DEBOUNCE):
+        self.debounce = debounce
+        self._pending = {}
+        self._workers = {}
+        self._renames = {}  # channel id -> deque of rename times
+
+        # Counters (saved = requests merged into another edit or found to be no-ops)
+        self.requested = 0
+        self.sent = 0
+        self.saved = 0
+
+    def name(self, channel):
+        """The name the channel will have once pending edits are applied"""
+        pending = self._pending.get(channel.id)
+        if pending and pending.name is not None:
+            return pending.name
+        return channel.name
+
+    def pending(self, channel_id):
+        return self._pending.get(channel_id)
+
+    def eta(self, channel):
+        """Seconds until a name change queued now would be applied"""
+        renames = self._renames.get(channel.id)
+        if not renames or len(renames) < RENAME_LIMIT:
+            return 0
+        return max(0, renames[0] + RENAME_WINDOW - time.monotonic())
+
+    def edit(self, channel, name=None, overwrites=None):
+        """Queue a change and return the merged pending state"""
+        pending = self._pending.setdefault(channel.id, PendingEdit())
+        if name is not None:
+            pending.name = name
+        if overwrites:
+            pending.overwrites.update(overwrites)
+        pending.requests += 1
+        self.requested += 1
+
+        if channel.id not in self._workers:
+            self._workers[channel.id] = asyncio.create_task(self._work(channel))
+        return pending
+
+    def forget(self, channel_id):
+        """Drop pending edits, e.g. because the channel is being deleted"""
+        self._pending.pop(channel_id, None)
+        self._renames.pop(channel_id, None)
+        worker = self._workers.pop(channel_id, None)
+        if worker and worker is not asyncio.current_task():
+            worker.cancel()
+
+    async def _work(self, channel):
+        try:
+            while channel.id in self._pending:
+                await asyncio.sleep(self.debounce)
+                pending = self._pending.get(channel.id)
+                if pending is None:
+                    break
+
+                name = pending.name if pending.name not in (None, channel.name) else None
+                if name is not None and self.eta(channel):
+                    if pending.overwrites:
+                        # Permissions don't count against the rename limit
+                        overwrites, pending.overwrites = pending.overwrites, {}
+                        pending.sent += 1
+                        await self._send(channel, None, overwrites)
+                        continue
+                    await asyncio.sleep(self.eta(channel))
+                    continue
+
+                del self._pending[channel.id]
+                if name is not None or pending.overwrites:
+                    pending.sent += 1
+                    await self._send(channel, name, pending.overwrites)
+                self.saved += max(0, pending.requests - pending.sent)
+        finally:
+            if self._workers.get(channel.id) is asyncio.current_task():
+                del self._workers[channel.id]
+
+    async def _send(self, channel, name, changes):
+        kwargs = {}
+        if name is not None:
+            kwargs['name'] = name
+        if changes:
+            overwrites = dict(channel.overwrites)
+            for target, overwrite in changes.items():
+                if overwrite is None:
+                    overwrites.pop(target, None)
+                else:
+                    overwrites[target] = overwrite
+            kwargs['overwrites'] = overwrites
+
+        try:
+            await channel.edit(**kwargs)
+        except discord.NotFound:
+            self.forget(channel.id)
+            return
+        except discord.HTTPException as e:
+            log.error('Failed to edit #%s: %s', channel.name, e, extra={'channel_id': channel.id})
+            return
+        finally:
+            self.sent += 1
+
+        if name is not None:
+            renames = self._renames.setdefault(channel.id, deque(maxlen=RENAME_LIMIT))
+            renames.append(time.monotonic())
@@ -0,0 +1,107 @@
+"""Run the bot as N processes, each owning a contiguous range of shards.
+
+    python cluster.py --clusters 4 [--shards 16] [--base-port 5000]
+
+Without --shards the shard count Discord recommends is used. Each process
+gets SHARD_COUNT, SHARD_IDS, CLUSTER_ID and its own PORT for health and
+metrics. Crashed processes are restarted, ones that exit cleanly are not;
+SIGTERM is forwarded to all of them so they can shut down cleanly.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+from sharding import split_shards
+
+RESTART_DELAY = 5
+GATEWAY_URL = 'https://discord.com/api/v10/gateway/bot'
+
+
+def recommended_shards(token):
+    request = urllib.request.Request(GATEWAY_URL, headers={
+        'Authorization': f'Bot {token}',
+        'User-Agent': 'DiscordBot (ticket-bot cluster launcher)'
+    })
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)['shards']
+
+
+def spawn(cluster_id, shard_ids, shard_count, port):
+    env = dict(os.environ,
+               CLUSTER_ID=str(cluster_id),
+               SHARD_COUNT=str(shard_count),
+               SHARD_IDS=','.join(map(str, shard_ids)),
+               PORT=str(port))
+    bot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')
+    print(f'🚀 Cluster {cluster_id}: shards {shard_ids[0]}-{shard_ids[-1]} of {shard_count}, port {port}')
+    return subprocess.Popen([sys.executable, bot_path], env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the ticket bot as a cluster of sharded processes')
+    parser.add_argument('--clusters', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--shards', type=int, default=None, help='total shards (default: Discord recommendation)')
+    parser.add_argument('--base-port', type=int, default=int(os.getenv('PORT', 5000)))
+    args = parser.parse_args()
+
+    token = os.getenv('TOKEN')
+    if not token:
+        print('❌ ERROR: No TOKEN found in environment variables!')
+        return 1
+
+    shard_count = args.shards or recommended_shards(token)
+    clusters = max(1, min(args.clusters, shard_count))
+    ranges = split_shards(shard_count, clusters)
+    print(f'📊 Running {shard_count} shards in {clusters} processes')
+
+    processes = {}
+    stopping = False
+
+    def stop(signum=None, frame=None):
+        nonlocal stopping
+        stopping = True
+        for process in processes.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+
+    # Installed before the first spawn, so a stop during startup reaches the children
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for cluster_id, shard_ids in enumerate(ranges):
+        if stopping:
+            break
+        processes[cluster_id] = spawn(cluster_id, shard_ids, shard_count, args.base_port + cluster_id)
+        # Discord only allows one IDENTIFY every 5 seconds per bucket
+        time.sleep(RESTART_DELAY)
+
+    while True:
+        if stopping:
+            # Again for a process spawned while the signal was handled
+            stop()
+            for process in processes.values():
+                process.wait()
+            return 0
+        for cluster_id, process in list(processes.items()):
+            code = process.poll()
+            if code == 0:
+                print(f'✅ Cluster {cluster_id} exited cleanly')
+                del processes[cluster_id]
+            elif code is not None:
+                print(f'⚠️ Cluster {cluster_id} exited with code {code}, restarting')
+                time.sleep(RESTART_DELAY)
+                if not stopping:
+                    processes[cluster_id] = spawn(cluster_id, ranges[cluster_id], shard_count,
+                                                  args.base_port + cluster_id)
+        if not processes:
+            return 0
+        time.sleep(1)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
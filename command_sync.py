@@ -0,0 +1,50 @@
+import hashlib
+import json
+import logging
+
+log = logging.getLogger('ticketbot.command_sync')
+
+
+class CommandSync:
+    """Pushes the global app command tree to Discord only when it changed.
+
+    The tree is hashed and compared with the hash of the last successful
+    sync stored in MongoDB, so restarts and reconnects don't re-upload the
+    same commands. A changed tree is sent as one bulk overwrite. Without a
+    database every start syncs once.
+    """
+
+    def __init__(self, tree, db=None):
+        self.tree = tree
+        self.db = db
+        self.synced = False
+
+    def payload(self):
+        return sorted((command.to_dict() for command in self.tree.get_commands()), key=lambda c: c['name'])
+
+    def digest(self):
+        encoded = json.dumps(self.payload(), sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    async def stored_digest(self):
+        if not (self.db and self.db.connected):
+            return None
+        doc = await self.db.find_one('app_commands', {'_id': 'global'})
+        return doc['hash'] if doc else None
+
+    async def sync(self):
+        """Sync the tree if it differs from the last sync, returning whether it did"""
+        if self.synced:
+            return False
+        digest = self.digest()
+        if digest == await self.stored_digest():
+            self.synced = True
+            log.info('App commands unchanged (%d commands)', len(self.payload()))
+            return False
+
+        commands = await self.tree.sync()
+        self.synced = True
+        log.info('Synced %d app commands', len(commands))
+        if self.db and self.db.connected:
+            await self.db.update('app_commands', {'_id': 'global'}, {'$set': {'hash': digest}})
+        return True
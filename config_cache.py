@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import time
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from metrics import CONFIG_LOOKUPS, CONFIG_UPDATES
+
+log = logging.getLogger('ticketbot.config_cache')
+
+# Polling fallback when change streams aren't available (standalone MongoDB)
+POLL_INTERVAL = 10.0
+# Polls re-read this far back to cover clock skew between instances and
+# writes that sat in another instance's write-behind queue
+POLL_LOOKBACK = 60.0
+RETRY_DELAY = 5.0
+
+# Server errors meaning "change streams can't work here"
+NO_CHANGE_STREAMS = {40573, 40324}  # not a replica set, $changeStream unsupported
+# The resume token fell off the oplog
+HISTORY_LOST = {280, 286}
+
+
+class ConfigCache:
+    """In-memory copy of a per-guild settings collection, kept in step with
+    MongoDB across instances.
+
+    Documents carry a ``guild_id``, a ``key_field`` naming the setting within
+    the guild and a ``version`` stamp written on every change. Lookups never
+    touch the database. Changes made by other instances or directly in MongoDB
+    arrive through a change stream; on servers without change streams the
+    cache polls for documents with a newer ``version`` instead. Either way
+    only changed documents are read, the collection is loaded in full once.
+    A document with ``deleted: true`` removes the setting.
+    """
+
+    def __init__(self, db, collection, key_field, owns_guild=None, poll_interval=POLL_INTERVAL):
+        self.db = db
+        self.collection = collection
+        self.key_field = key_field
+        self.owns_guild = owns_guild or (lambda guild_id: True)
+        self.poll_interval = poll_interval
+
+        self._guilds = {}  # guild_id -> {key: document}
+        self._ids = {}  # _id -> (guild_id, key), to apply deletes
+        self.version = 0.0  # newest stamp seen
+        self.loaded = False
+        self.mode = None  # 'stream' or 'poll' once started
+        self._task = None
+
+        self._hits = CONFIG_LOOKUPS.labels(collection, 'hit')
+        self._misses = CONFIG_LOOKUPS.labels(collection, 'miss')
+        self._stream_updates = CONFIG_UPDATES.labels(collection, 'stream')
+        self._poll_updates = CONFIG_UPDATES.labels(collection, 'poll')
+
+    @property
+    def hits(self):
+        return self._hits.value
+
+    @property
+    def misses(self):
+        return self._misses.value
+
+    # Reads (memory only)
+    def get(self, guild_id, key):
+        doc = self._guilds.get(str(guild_id), {}).get(key)
+        if doc is None:
+            self._misses.inc()
+        else:
+            self._hits.inc()
+        return doc
+
+    def guild(self, guild_id):
+        """Every setting of one guild, as {key: document}"""
+        return dict(self._guilds.get(str(guild_id), {}))
+
+    def configured(self, guild_id):
+        """Whether the guild has any setting at all (no copy, no hit/miss count)"""
+        return bool(self._guilds.get(str(guild_id)))
+
+    # Writes
+    async def set(self, guild_id, key, fields):
+        """Change a setting here right away and queue the write for MongoDB.
+
+        The stored document is replaced, so fields (and a ``deleted`` flag)
+        the new settings don't have are gone everywhere, not just here.
+        """
+        guild_id = str(guild_id)
+        doc = {'guild_id': guild_id, self.key_field: key, **fields, 'version': self._stamp()}
+        self.apply(doc)
+        if self.db and self.db.connected:
+            await self.db.replace(self.collection, {'guild_id': guild_id, self.key_field: key}, doc)
+        return doc
+
+    async def delete(self, guild_id, key):
+        """Tombstone a setting so polling instances see the removal too"""
+        return await self.set(guild_id, key, {'deleted': True})
+
+    def _stamp(self):
+        # Strictly increasing even if the clock stalls
+        self.version = max(time.time(), self.version + 1e-6)
+        return self.version
+
+    def apply(self, doc, force=False):
+        """Apply one document if it's newer than what the cache holds; returns whether it changed anything"""
+        guild_id = str(doc.get('guild_id'))
+        key = doc.get(self.key_field)
+        if key is None or not self.owns_guild(guild_id):
+            return False
+        # Even for a stale copy: our own writes only learn their _id from the
+        # change stream echo, and deletes by _id need it
+        if '_id' in doc:
+            self._ids[doc['_id']] = (guild_id, key)
+        settings = self._guilds.setdefault(guild_id, {})
+        current = settings.get(key)
+        version = doc.get('version', 0)
+        if current is not None and current.get('version', 0) >= version and not force:
+            return False
+        self.version = max(self.version, version)
+        if doc.get('deleted'):
+            settings.pop(key, None)
+        else:
+            settings[key] = doc
+        return True
+
+    def _remove(self, document_id):
+        guild_id, key = self._ids.pop(document_id, (None, None))
+        if guild_id is not None:
+            self._guilds.get(guild_id, {}).pop(key, None)
+            return True
+        return False
+
+    # Syncing with MongoDB
+    async def load(self):
+        """Read the whole collection once; later changes come in incrementally"""
+        if self.loaded or not (self.db and self.db.connected):
+            return
+        for doc in await self.db.find(self.collection):
+            self.apply(doc)
+        self.loaded = True
+
+    def start(self):
+        if self._task is None and self.db and self.db.connected:
+            self._task = asyncio.create_task(self._watch())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def catch_up(self):
+        """Apply documents changed since the newest version seen (minus the lookback)"""
+        since = self.version - POLL_LOOKBACK
+        changed = 0
+        for doc in await self.db.find(self.collection, {'version': {'$gt': since}}):
+            if self.apply(doc):
+                changed += 1
+        if changed:
+            self._poll_updates.inc(changed)
+        return changed
+
+    async def _watch(self):
+        token = None
+        while True:
+            try:
+                stream = await self.db.watch(self.collection, resume_after=token)
+            except OperationFailure as e:
+                if e.code in NO_CHANGE_STREAMS:
+                    log.warning('No change streams for %s, polling every %.0fs', self.collection, self.poll_interval)
+                    return await self._poll()
+                if e.code in HISTORY_LOST:
+                    token = None
+                    continue
+                log.error('Change stream on %s failed: %s', self.collection, e)
+                await asyncio.sleep(RETRY_DELAY)
+                continue
+            except PyMongoError as e:
+                log.error('Change stream on %s failed: %s', self.collection, e)
+                await asyncio.sleep(RETRY_DELAY)
+                continue
+
+            self.mode = 'stream'
+            try:
+                # Changes made while the stream was down (or before the first one opened)
+                await self.catch_up()
+                while True:
+                    change = await self.db.next_change(stream)
+                    if change is None:
+                        continue
+                    token = change['_id']
+                    self._apply_change(change)
+            except PyMongoError as e:
+                if isinstance(e, OperationFailure) and e.code in HISTORY_LOST:
+                    token = None
+                log.warning('Change stream on %s interrupted, resuming: %s', self.collection, e)
+                await asyncio.sleep(RETRY_DELAY)
+            finally:
+                try:
+                    await self.db.close_stream(stream)
+                except Exception:
+                    pass
+
+    def _apply_change(self, change):
+        operation = change.get('operationType')
+        if operation in ('insert', 'update', 'replace'):
+            doc = change.get('fullDocument')
+            # Edits made by hand may not bump the version, the stream is ordered anyway
+            changed = self.apply(doc, force='version' not in doc) if doc else False
+        elif operation == 'delete':
+            changed = self._remove(change['documentKey']['_id'])
+        else:
+            changed = False
+        if changed:
+            self._stream_updates.inc()
+
+    async def _poll(self):
+        self.mode = 'poll'
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.catch_up()
+            except PyMongoError as e:
+                log.error('Polling %s failed: %s', self.collection, e)
@@ -0,0 +1,306 @@
+import asyncio
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gridfs
+from pymongo import MongoClient, UpdateOne, ReplaceOne, DeleteOne, InsertOne
+from pymongo.errors import AutoReconnect, BulkWriteError, NetworkTimeout, PyMongoError
+
+from metrics import MONGO_SECONDS
+
+log = logging.getLogger('ticketbot.database')
+
+# Write-behind settings
+FLUSH_INTERVAL = 0.5
+BATCH_SIZE = 500
+MAX_PENDING = 5000
+
+
+class Database:
+    """Async wrapper around pymongo.
+
+    pymongo is blocking, so every driver call runs on a small thread pool
+    instead of the discord.py event loop. Writes are queued, coalesced per
+    document and sent as batched ``bulk_write`` calls every ``flush_interval``
+    seconds or as soon as ``batch_size`` writes are pending.
+    """
+
+    def __init__(self, url, name='discord_bot', flush_interval=FLUSH_INTERVAL,
+                 batch_size=BATCH_SIZE, max_pending=MAX_PENDING):
+        self.url = url
+        self.name = name
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+
+        self.client = None
+        self.db = None
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='mongo')
+        # Change streams block a thread while they wait, keep them off the main pool
+        self._stream_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='mongo-stream')
+        self._pending = {}  # collection -> {key: op}
+        self._pending_count = 0
+        self._unique = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._flush_lock = asyncio.Lock()
+        self._flusher = None
+        self._closed = False
+
+        # Counters
+        self.writes_queued = 0
+        self.writes_coalesced = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    async def _run(self, op, func, *args, _executor=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(_executor or self._executor, lambda: func(*args, **kwargs))
+        finally:
+            MONGO_SECONDS.labels(op).observe(time.perf_counter() - started)
+
+    @property
+    def connected(self):
+        return self.db is not None
+
+    # Lifecycle
+    async def connect(self, client=None):
+        """Create the client off the loop (SRV lookups block) and start flushing.
+
+        ``client`` replaces the pymongo client, e.g. with an in-memory stand-in.
+        """
+        self.client = client or await self._run('connect', MongoClient, self.url)
+        self.db = self.client[self.name]
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Flush every pending write, then shut the driver down"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        while self._pending_count:
+            before = self._pending_count
+            await self.flush()
+            if self._pending_count >= before:
+                log.error('Dropping %d unflushed MongoDB writes', self._pending_count)
+                break
+        if self.client:
+            await self._run('close', self.client.close)
+        self._executor.shutdown(wait=True)
+        self._stream_executor.shutdown(wait=False, cancel_futures=True)
+
+    # Reads
+    async def find(self, collection, query=None, projection=None):
+        return await self._run('find', lambda: list(self.db[collection].find(query or {}, projection)))
+
+    async def find_one(self, collection, query, projection=None):
+        return await self._run('find_one', self.db[collection].find_one, query, projection)
+
+    async def command(self, *args, **kwargs):
+        return await self._run('command', self.db.command, *args, **kwargs)
+
+    async def create_index(self, collection, keys, **kwargs):
+        return await self._run('create_index', self.db[collection].create_index, keys, **kwargs)
+
+    async def upload_file(self, filename, path, metadata=None):
+        """Stream a file from disk into GridFS and return its id"""
+        def upload():
+            bucket = gridfs.GridFSBucket(self.db)
+            with open(path, 'rb') as f:
+                return bucket.upload_from_stream(filename, f, metadata=metadata)
+        return await self._run('upload_file', upload)
+
+    # Change streams (need a replica set; standalone servers raise OperationFailure)
+    async def watch(self, collection, resume_after=None, max_await=1.0):
+        """Open a change stream on a collection, read it with ``next_change``"""
+        return await self._run('watch', self.db[collection].watch, full_document='updateLookup',
+                               resume_after=resume_after, max_await_time_ms=int(max_await * 1000),
+                               _executor=self._stream_executor)
+
+    async def next_change(self, stream):
+        """Next change event, or None if nothing happened within ``max_await``"""
+        return await self._run('change_stream', stream.try_next, _executor=self._stream_executor)
+
+    async def close_stream(self, stream):
+        await self._run('close_stream', stream.close, _executor=self._stream_executor)
+
+    # Writes (write-behind)
+    async def update(self, collection, query, update, upsert=True):
+        """Queue an update. Pending ``$set``/``$unset``/``$inc`` updates to the
+        same document are merged, so only the latest state is written and
+        increments are summed."""
+        key = _freeze(query)
+        ops = self._pending.setdefault(collection, {})
+        previous = ops.get(key)
+        if previous and previous[0] == 'update' and _mergeable(previous[2]) and _mergeable(update):
+            ops[key] = ('update', query, _merge(previous[2], update), upsert or previous[3])
+            self.writes_coalesced += 1
+            return
+        if previous:
+            # Keep ordering for writes that can't be merged
+            ops[(key, next(self._unique))] = previous
+            del ops[key]
+            ops[key] = ('update', query, update, upsert)
+            self._pending_count += 1
+        else:
+            ops[key] = ('update', query, update, upsert)
+            self._pending_count += 1
+        await self._queued()
+
+    async def replace(self, collection, query, document, upsert=True):
+        """Queue a replacement of the whole document; it supersedes any pending
+        write to the same document"""
+        await self._supersede(collection, query, ('replace', query, document, upsert))
+
+    async def delete(self, collection, query):
+        """Queue a delete; it replaces any pending update to the same document"""
+        await self._supersede(collection, query, ('delete', query, None, False))
+
+    async def _supersede(self, collection, query, op):
+        key = _freeze(query)
+        ops = self._pending.setdefault(collection, {})
+        if key in ops:
+            del ops[key]
+            self.writes_coalesced += 1
+        else:
+            self._pending_count += 1
+        ops[key] = op
+        await self._queued()
+
+    async def insert(self, collection, document):
+        ops = self._pending.setdefault(collection, {})
+        ops[('insert', next(self._unique))] = ('insert', document, None, False)
+        self._pending_count += 1
+        await self._queued()
+
+    async def _queued(self):
+        self.writes_queued += 1
+        if self._pending_count >= self.batch_size:
+            self._wakeup.set()
+        if self._pending_count >= self.max_pending:
+            # Backpressure: wait for the flusher instead of growing without bound
+            self._space.clear()
+            self._wakeup.set()
+            await self._space.wait()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._pending_count:
+                await self.flush()
+
+    async def flush(self):
+        """Send all pending writes, one ordered ``bulk_write`` per collection"""
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            self._pending_count = 0
+            self._space.set()
+
+            for collection, ops in pending.items():
+                items = list(ops.items())
+                start = 0
+                while start < len(items):
+                    batch = items[start:start + self.batch_size]
+                    try:
+                        await self._run('bulk_write', self.db[collection].bulk_write,
+                                        [_to_request(op) for _, op in batch], ordered=True)
+                        self.flushes += 1
+                        start += len(batch)
+                    except (AutoReconnect, NetworkTimeout) as e:
+                        # Transient, try the rest again on the next flush
+                        self.flush_errors += 1
+                        log.error('MongoDB flush to %s failed, retrying: %s', collection, e)
+                        self._requeue(collection, items[start:])
+                        break
+                    except BulkWriteError as e:
+                        # Ordered writes stop at the first error: everything before it
+                        # was applied and the failing write will never succeed
+                        self.flush_errors += 1
+                        errors = e.details.get('writeErrors') or []
+                        if not errors:
+                            log.error('MongoDB flush to %s not acknowledged: %s', collection, e.details)
+                            start += len(batch)
+                            continue
+                        failed = start + errors[0]['index']
+                        log.error('Dropping MongoDB write to %s: %s (%s)', collection, errors[0].get('errmsg'),
+                                  items[failed][1][0])
+                        start = failed + 1
+                    except PyMongoError as e:
+                        self.flush_errors += 1
+                        log.error('Dropping %d MongoDB writes to %s: %s', len(batch), collection, e)
+                        start += len(batch)
+
+    def _requeue(self, collection, items):
+        # Retried writes go before the ones queued during the failed flush;
+        # a newer mergeable update absorbs the retried one so increments add up
+        ops = self._pending.setdefault(collection, {})
+        retry = {}
+        for key, op in items:
+            newer = ops.get(key)
+            if newer is None:
+                retry[key] = op
+            elif op[0] == newer[0] == 'update' and _mergeable(op[2]) and _mergeable(newer[2]):
+                ops[key] = ('update', newer[1], _merge(op[2], newer[2]), op[3] or newer[3])
+            else:
+                retry[(key, next(self._unique))] = op
+        self._pending[collection] = {**retry, **ops}
+        self._pending_count += len(retry)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _mergeable(update):
+    return set(update) <= {'$set', '$unset', '$setOnInsert', '$inc'}
+
+
+def _merge(old, new):
+    merged = {op: dict(fields) for op, fields in old.items()}
+    for field in new.get('$set', {}):
+        merged.get('$unset', {}).pop(field, None)
+    for field in new.get('$unset', {}):
+        merged.get('$set', {}).pop(field, None)
+    for op, fields in new.items():
+        if op == '$setOnInsert':
+            merged[op] = {**fields, **merged.get(op, {})}
+        elif op == '$inc':
+            # Counters add up, e.g. many rollup increments become one write
+            target = merged.setdefault(op, {})
+            for field, amount in fields.items():
+                target[field] = target.get(field, 0) + amount
+        else:
+            merged.setdefault(op, {}).update(fields)
+    return {op: fields for op, fields in merged.items() if fields}
+
+
+def _to_request(op):
+    kind, query, update, upsert = op
+    if kind == 'update':
+        return UpdateOne(query, update, upsert=upsert)
+    if kind == 'replace':
+        return ReplaceOne(query, update, upsert=upsert)
+    if kind == 'delete':
+        return DeleteOne(query)
+    return InsertOne(query)
@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timezone
+
+import discord
+
+log = logging.getLogger('ticketbot.deletions')
+
+# Deletes running at once, and the minimum spacing between two of them
+CONCURRENCY = 10
+MIN_INTERVAL = 0.05
+RETRY_DELAY = 30
+# How long shutdown waits for deletes and holds in flight
+CLOSE_TIMEOUT = 10.0
+
+
+class DeletionScheduler:
+    """Deletes channels once they are due.
+
+    Due times live in a heap and are mirrored to the ``deletions``
+    collection, so a restart picks up where it left off instead of
+    orphaning channels. A single background task pops due entries and
+    deletes them concurrently up to ``concurrency``, spaced at least
+    ``min_interval`` apart so bulk closes stay within Discord's rate budget.
+    """
+
+    def __init__(self, bot, db=None, concurrency=CONCURRENCY, min_interval=MIN_INTERVAL):
+        self.bot = bot
+        self.db = db
+        self.min_interval = min_interval
+        self._heap = []
+        self._due = {}  # channel id -> due time, the heap may hold stale entries
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._running = set()
+        self._holds = {}  # channel id -> task that must finish before deleting
+        self._task = None
+
+        # Counters
+        self.deleted = 0
+        self.failed = 0
+
+    def __len__(self):
+        return len(self._due)
+
+    def __contains__(self, channel_id):
+        return channel_id in self._due
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout=CLOSE_TIMEOUT):
+        """Stop scheduling and wait up to ``timeout`` seconds for deletes and
+        transcript exports already in flight"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # The deletion is persisted but the export isn't, it wouldn't run again after a restart
+        waiting = [*self._running, *self._holds.values()]
+        if waiting:
+            _, pending = await asyncio.wait(waiting, timeout=timeout)
+            if pending:
+                log.warning('%d deletes or transcript exports still running at shutdown', len(pending))
+
+    async def load(self, owns_guild=None):
+        """Resume persisted deletions, optionally only for guilds ``owns_guild`` accepts"""
+        if not (self.db and self.db.connected):
+            return
+        for doc in await self.db.find('deletions'):
+            if owns_guild and doc.get('guild_id') and not owns_guild(doc['guild_id']):
+                continue
+            due = doc['due'].replace(tzinfo=timezone.utc).timestamp() if doc.get('due') else time.time()
+            self._push(doc['_id'], due)
+
+    async def schedule(self, channel_id, delay=0, guild_id=None):
+        due = time.time() + delay
+        self._push(channel_id, due)
+        if self.db and self.db.connected:
+            fields = {'due': datetime.utcfromtimestamp(due)}
+            if guild_id:
+                fields['guild_id'] = guild_id
+            await self.db.update('deletions', {'_id': channel_id}, {'$set': fields})
+
+    async def cancel(self, channel_id):
+        if self._due.pop(channel_id, None) is not None and self.db and self.db.connected:
+            await self.db.delete('deletions', {'_id': channel_id})
+
+    def hold(self, channel_id, task):
+        """Keep the channel until ``task`` is done, e.g. a transcript export.
+
+        One hold per channel: a second one is ignored (returns False).
+        """
+        if channel_id in self._holds:
+            return False
+        self._holds[channel_id] = task
+        task.add_done_callback(lambda _: self._release(channel_id, task))
+        return True
+
+    def held(self, channel_id):
+        return channel_id in self._holds
+
+    def _release(self, channel_id, task):
+        if self._holds.get(channel_id) is not task:
+            return
+        del self._holds[channel_id]
+        # A delete that came due while held goes right away
+        due = self._due.get(channel_id)
+        if due is not None and due <= time.time():
+            self._push(channel_id, time.time())
+
+    def _push(self, channel_id, due):
+        self._due[channel_id] = due
+        heapq.heappush(self._heap, (due, channel_id))
+        if self._heap[0][1] == channel_id:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            delay = self._heap[0][0] - time.time() if self._heap else None
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due, channel_id = heapq.heappop(self._heap)
+            if self._due.get(channel_id) != due:
+                continue  # cancelled or rescheduled
+            if channel_id in self._holds:
+                continue  # _release pushes it again
+
+            await self._slots.acquire()
+            if self._due.get(channel_id) != due:
+                self._slots.release()
+                continue
+            del self._due[channel_id]
+            task = asyncio.create_task(self._delete(channel_id))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            await asyncio.sleep(self.min_interval)
+
+    async def _delete(self, channel_id):
+        try:
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                channel = await self.bot.fetch_channel(channel_id)
+            await channel.delete(reason='Ticket closed')
+            self.deleted += 1
+        except discord.NotFound:
+            pass
+        except discord.Forbidden as e:
+            self.failed += 1
+            log.error('Not allowed to delete channel %s: %s', channel_id, e, extra={'channel_id': channel_id})
+        except discord.HTTPException as e:
+            log.warning('Deleting channel %s failed, retrying: %s', channel_id, e, extra={'channel_id': channel_id})
+            await self.schedule(channel_id, RETRY_DELAY)
+            return
+        finally:
+            self._slots.release()
+
+        if self.db and self.db.connected:
+            await self.db.delete('deletions', {'_id': channel_id})
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import logging
+import math
+import time
+
+from aiohttp import web
+
+import metrics
+
+log = logging.getLogger('ticketbot.health')
+
+# Heartbeat latency above this makes the bot report not ready
+MAX_LATENCY = 5.0
+# How long a MongoDB ping result is reused
+PING_CACHE = 5.0
+PING_TIMEOUT = 2.0
+
+STATUS_PAGE = "<h1 style='text-align:center; margin-top:50px; font-family:Arial;'>Bot is {state}</h1>"
+
+
+class HealthServer:
+    """Health, readiness and metrics endpoints served from the bot's own loop.
+
+    ``/health`` only says the process is alive; ``/ready`` checks the gateway
+    connection, heartbeat latency, MongoDB and the startup warm-up and
+    answers 503 when any of them is down or the bot is shutting down, so an
+    orchestrator can trust it.
+    """
+
+    def __init__(self, bot, db=None, host='0.0.0.0', port=5000, lifecycle=None):
+        self.bot = bot
+        self.db = db
+        self.lifecycle = lifecycle
+        self.host = host
+        self.port = port
+        self._runner = None
+        self._ping = None
+        self._ping_result = (0.0, None)  # (checked at, ok)
+
+        self.app = web.Application()
+        self.app.router.add_get('/', self.home)
+        self.app.router.add_get('/health', self.health)
+        self.app.router.add_get('/ready', self.ready)
+        self.app.router.add_get('/metrics', self.metrics_page)
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        log.info('Health server listening on port %d', self.port)
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def mongo_ok(self):
+        """Ping MongoDB, sharing one in-flight ping and caching the result briefly"""
+        if not self.db:
+            return None
+        checked, ok = self._ping_result
+        if time.monotonic() - checked < PING_CACHE:
+            return ok
+        if self._ping is None:
+            self._ping = asyncio.create_task(self._do_ping())
+        return await asyncio.shield(self._ping)
+
+    async def _do_ping(self):
+        try:
+            if not self.db.connected:
+                ok = False
+            else:
+                await asyncio.wait_for(self.db.command('ping'), timeout=PING_TIMEOUT)
+                ok = True
+        except Exception:
+            ok = False
+        self._ping_result = (time.monotonic(), ok)
+        self._ping = None
+        return ok
+
+    def shards(self):
+        """Connection state and latency per shard (a single entry when unsharded)"""
+        shards = getattr(self.bot, 'shards', None)
+        if not shards:
+            return {self.bot.shard_id or 0: (not self.bot.is_closed(), self.bot.latency)}
+        return {shard_id: (not shard.is_closed(), shard.latency) for shard_id, shard in shards.items()}
+
+    async def status(self):
+        latency = self.bot.latency
+        shards = self.shards()
+        gateway = self.bot.is_ready() and not self.bot.is_closed() and all(up for up, _ in shards.values())
+        latency_ok = all(math.isfinite(l) and l < MAX_LATENCY for _, l in shards.values())
+        mongo = await self.mongo_ok()
+        checks = {
+            'gateway': gateway,
+            'latency': round(latency, 3) if math.isfinite(latency) else None,
+            'latency_ok': latency_ok,
+            'mongo': mongo,
+            'warmed_up': self.lifecycle.ready if self.lifecycle else None,
+            'stopping': self.lifecycle.stopping if self.lifecycle else False,
+            'guilds': len(self.bot.guilds),
+            'shards': {
+                str(shard_id): {'connected': up, 'latency': round(l, 3) if math.isfinite(l) else None}
+                for shard_id, (up, l) in shards.items()
+            }
+        }
+        ready = gateway and latency_ok and mongo is not False and checks['warmed_up'] is not False and not checks['stopping']
+        return ready, checks
+
+    async def home(self, request):
+        ready, _ = await self.status()
+        return web.Response(text=STATUS_PAGE.format(state='Active' if ready else 'Starting'),
+                            content_type='text/html')
+
+    async def health(self, request):
+        return web.Response(text='ok')
+
+    async def ready(self, request):
+        ready, checks = await self.status()
+        checks['ready'] = ready
+        return web.Response(text=json.dumps(checks), status=200 if ready else 503,
+                            content_type='application/json')
+
+    async def metrics_page(self, request):
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
@@ -0,0 +1,147 @@
+import asyncio
+import heapq
+import time
+
+# Longest single sleep, so clock jumps are noticed eventually
+MAX_SLEEP = 3600
+# Entries handled before yielding to the event loop (a restart after downtime can make many due at once)
+SWEEP_BATCH = 1000
+# Persisted activity times may lag this many seconds behind, for at most one write per ticket per interval
+SAVE_INTERVAL = 60
+
+
+class InactivitySweeper:
+    """Warns about and then closes tickets nobody has written in for a while.
+
+    Every tracked ticket has one entry in a heap of deadlines, served by a
+    single background task. Messages only update the last-activity time in a
+    dict (O(1)); when an entry comes due and the ticket turns out to have been
+    active since, it is pushed back with its new deadline (O(log n)), so the
+    heap is touched at most once per timeout period per ticket no matter how
+    busy the channel is.
+
+    ``on_warn(channel_id, remaining)`` runs when a ticket has been idle for
+    the timeout it was tracked with; ``on_close(channel_id, idle)`` runs if it is still
+    idle ``grace`` seconds after the warning.
+    """
+
+    def __init__(self, grace, on_warn, on_close, clock=time.time):
+        self.grace = grace
+        self.on_warn = on_warn
+        self.on_close = on_close
+        self.clock = clock
+        self._heap = []
+        self._tickets = {}  # channel id -> [last activity, timeout, warned at, generation]
+        self._generation = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._running = set()
+
+        # Counters
+        self.warned = 0
+        self.closed = 0
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def __contains__(self, channel_id):
+        return channel_id in self._tickets
+
+    def track(self, channel_id, timeout, last_activity=None, warned_at=None):
+        """Start watching a ticket that closes after ``timeout`` idle seconds; None never closes.
+
+        ``warned_at`` resumes a ticket that was already warned, so it closes
+        ``grace`` seconds after that warning instead of being warned again.
+        """
+        if not timeout:
+            self.forget(channel_id)
+            return
+        self._generation += 1
+        last_activity = last_activity or self.clock()
+        self._tickets[channel_id] = [last_activity, timeout, warned_at, self._generation]
+        due = warned_at + self.grace if warned_at else last_activity + timeout
+        self._push(due, channel_id, self._generation)
+
+    def touch(self, channel_id, at=None):
+        """Record activity in a ticket (called for every message, must stay cheap)"""
+        state = self._tickets.get(channel_id)
+        if state is not None:
+            state[0] = at or self.clock()
+            state[2] = None
+
+    def forget(self, channel_id):
+        # Its heap entry is dropped when it comes due
+        self._tickets.pop(channel_id, None)
+
+    def idle(self, channel_id):
+        state = self._tickets.get(channel_id)
+        return self.clock() - state[0] if state else None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def _push(self, due, channel_id, generation):
+        heapq.heappush(self._heap, (due, channel_id, generation))
+        if self._heap[0][1] == channel_id:
+            self._wakeup.set()
+
+    def sweep(self, limit=None):
+        """Handle entries that are due now, up to ``limit``; returns (warn, close) lists"""
+        now = self.clock()
+        warn, close = [], []
+        while self._heap and self._heap[0][0] <= now and (limit is None or len(warn) + len(close) < limit):
+            due, channel_id, generation = heapq.heappop(self._heap)
+            state = self._tickets.get(channel_id)
+            if state is None or state[3] != generation:
+                continue  # forgotten or tracked again since
+            last_activity, timeout, warned_at, _ = state
+            if warned_at is None:
+                deadline = last_activity + timeout
+                if deadline > now:
+                    self._push(deadline, channel_id, generation)
+                    continue
+                state[2] = now
+                self._push(now + self.grace, channel_id, generation)
+                warn.append(channel_id)
+            else:
+                deadline = warned_at + self.grace
+                if deadline > now:
+                    self._push(deadline, channel_id, generation)
+                    continue
+                del self._tickets[channel_id]
+                close.append((channel_id, now - last_activity))
+        return warn, close
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            warn, close = self.sweep(SWEEP_BATCH)
+            for channel_id in warn:
+                self.warned += 1
+                self._spawn(self.on_warn(channel_id, self.grace))
+            for channel_id, idle in close:
+                self.closed += 1
+                self._spawn(self.on_close(channel_id, idle))
+
+            delay = min(self._heap[0][0] - self.clock(), MAX_SLEEP) if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
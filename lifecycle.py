@@ -0,0 +1,80 @@
+import asyncio
+import contextlib
+import time
+
+# How long a command waits for the warm-up before it's turned away
+# (slash commands must be answered within 3 seconds)
+READY_TIMEOUT = 2.0
+# Buttons are acknowledged first, so they can wait longer
+DEFERRED_READY_TIMEOUT = 10.0
+# How long shutdown waits for ticket work that's already running
+DRAIN_TIMEOUT = 20.0
+# Backoff between attempts to load the ticket state while MongoDB is unreachable
+LOAD_RETRY = 2.0
+MAX_LOAD_RETRY = 60.0
+
+
+class Lifecycle:
+    """Readiness gate for startup and in-flight work tracking for shutdown.
+
+    The gateway connects right away while MongoDB and the caches warm up in
+    the background; ``mark_ready`` opens the gate and records the time to
+    ready. Ticket work runs inside ``work()`` so that ``drain`` can stop new
+    work and wait for the rest before the process exits.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.ready_after = None  # seconds from start to ready
+        self.drained_in = None  # seconds drain took
+        self.stopping = False
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._active = 0
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @property
+    def active(self):
+        return self._active
+
+    def mark_ready(self):
+        if not self.ready:
+            self.ready_after = self.clock() - self.started
+            self._ready.set()
+
+    async def wait_ready(self, timeout=READY_TIMEOUT):
+        """Whether the gate opened within ``timeout`` seconds"""
+        if self.ready:
+            return True
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    @contextlib.asynccontextmanager
+    async def work(self):
+        self._active += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._active -= 1
+            if not self._active:
+                self._idle.set()
+
+    async def drain(self, timeout=DRAIN_TIMEOUT):
+        """Refuse new work and wait for running work; returns how much is still running"""
+        self.stopping = True
+        started = self.clock()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.drained_in = self.clock() - started
+        return self._active
@@ -0,0 +1,113 @@
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import uuid
+from datetime import datetime, timezone
+
+# Parent of every logger in the bot ('ticketbot.database', ...)
+APP_LOGGER = 'ticketbot'
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# Guild, channel, user, ticket type and correlation id of the work the
+# current task is doing; tasks started from it inherit a copy
+_context = contextvars.ContextVar('log_context', default=None)
+
+# Attributes every LogRecord has, anything else came in through ``extra``
+_RECORD_FIELDS = set(logging.makeLogRecord({}).__dict__) | {'message', 'context'}
+
+
+def bind(**fields):
+    """Add fields to the log context for the rest of the current task"""
+    _context.set({**(_context.get() or {}), **fields})
+
+
+@contextlib.contextmanager
+def context(**fields):
+    """Add fields to the log context inside a with block"""
+    token = _context.set({**(_context.get() or {}), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def correlation_id():
+    """A fresh id for work that doesn't start from a Discord interaction or message"""
+    return uuid.uuid4().hex[:16]
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread with the caller's log context.
+
+    Runs on the event loop, so it only merges the message arguments (they
+    may change after the call) and leaves JSON encoding and the write to
+    the listener thread.
+    """
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.context = _context.get()
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, context and extras"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        if getattr(record, 'context', None):
+            entry.update(record.context)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def setup(level='INFO', stream=None):
+    """Send every log record (the bot's and discord.py's) through a queue to
+    a JSON writer thread. Returns the listener; ``stop()`` it at exit so
+    queued records get written."""
+    records = queue.SimpleQueue()
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(records, writer)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(ContextQueueHandler(records))
+    root.setLevel(logging.INFO)
+    set_level(APP_LOGGER, level)
+    listener.start()
+    return listener
+
+
+def set_level(name, level):
+    """Change a logger's level at runtime; raises ValueError for unknown levels"""
+    level = level.upper()
+    if level not in LEVELS:
+        raise ValueError(f'Levels are {", ".join(LEVELS)}')
+    _logger(name).setLevel(level)
+
+
+def levels(*names):
+    """Effective level of the bot's, discord.py's, the root and any other named logger"""
+    return {name or 'root': logging.getLevelName(_logger(name).getEffectiveLevel())
+            for name in dict.fromkeys((APP_LOGGER, 'discord', 'root', *names))}
+
+
+def _logger(name):
+    return logging.getLogger(None if name in (None, '', 'root') else name)
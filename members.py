@@ -0,0 +1,126 @@
+import re
+import time
+from collections import OrderedDict
+
+import discord
+from discord.ext import commands
+
+# Members kept at most, and how long a fetched member is trusted
+CACHE_SIZE = 1000
+CACHE_TTL = 300
+
+MENTION_OR_ID = re.compile(r'<@!?([0-9]{15,20})>$|([0-9]{15,20})$')
+ROLE_MENTION_OR_ID = re.compile(r'<@&([0-9]{15,20})>$|([0-9]{15,20})$')
+
+
+class MemberCache:
+    """Small LRU of members fetched on demand, with a TTL.
+
+    Used instead of the full member list when the bot runs without chunking
+    and with member caching turned off: commands that need a member look
+    here first and fall back to one ``fetch_member`` call.
+    """
+
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._members = OrderedDict()  # (guild_id, user_id) -> (expires at, member)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._members)
+
+    def put(self, member):
+        if not isinstance(member, discord.Member):
+            return
+        key = (member.guild.id, member.id)
+        self._members[key] = (time.monotonic() + self.ttl, member)
+        self._members.move_to_end(key)
+        while len(self._members) > self.size:
+            self._members.popitem(last=False)
+
+    def cached(self, guild_id, user_id):
+        key = (guild_id, user_id)
+        entry = self._members.get(key)
+        if entry is None:
+            return None
+        expires, member = entry
+        if expires < time.monotonic():
+            del self._members[key]
+            return None
+        self._members.move_to_end(key)
+        return member
+
+    async def get(self, guild, user_id):
+        """The member, from the guild cache, this cache or the API; None if not in the guild"""
+        member = guild.get_member(user_id) or self.cached(guild.id, user_id)
+        if member:
+            self.hits += 1
+            return member
+        self.misses += 1
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+        self.put(member)
+        return member
+
+    def forget(self, guild_id, user_id):
+        self._members.pop((guild_id, user_id), None)
+
+
+class MemberLookup(commands.Converter):
+    """Resolves one member through a MemberCache.
+
+    Mentions and ids go through the cache, only names fall back to a
+    gateway member search.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    async def convert(self, ctx, argument):
+        match = MENTION_OR_ID.match(argument)
+        if not match:
+            return await commands.MemberConverter().convert(ctx, argument)
+        member = await self.cache.get(ctx.guild, int(match.group(1) or match.group(2)))
+        if member is None:
+            raise commands.MemberNotFound(argument)
+        return member
+
+
+class ParticipantList(commands.Converter):
+    """Any number of members and roles in one argument, e.g. ``@alice @bob @Staff``.
+
+    Roles are looked up in the guild cache by mention, id or name, everything
+    else goes through MemberLookup. Returns the targets without duplicates.
+    Also used by slash commands, as a text option.
+    """
+
+    def __init__(self, cache):
+        self.members = MemberLookup(cache)
+
+    async def convert(self, ctx, argument):
+        targets = {}
+        for token in argument.replace(',', ' ').split():
+            target = self.role(ctx.guild, token)
+            if target is None:
+                try:
+                    target = await self.members.convert(ctx, token)
+                except commands.MemberNotFound:
+                    raise commands.BadArgument(f'No member or role matches "{token}"') from None
+            targets[target.id] = target
+        if not targets:
+            raise commands.BadArgument('Mention at least one member or role')
+        return list(targets.values())
+
+    @staticmethod
+    def role(guild, token):
+        match = ROLE_MENTION_OR_ID.match(token)
+        if match:
+            role = guild.get_role(int(match.group(1) or match.group(2)))
+        else:
+            role = discord.utils.get(guild.roles, name=token)
+        # @everyone would open the ticket to the whole server
+        return role if role and not role.is_default() else None
@@ -0,0 +1,284 @@
+import bisect
+import contextvars
+import functools
+import time
+from collections import deque
+
+import aiohttp
+
+# Samples kept per timing for percentiles
+WINDOW = 1000
+# Histogram buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REGISTRY = []
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        """Child for one label combination; hot paths should keep a reference to it"""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._child()
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def _child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield f'{self.name}{_format_labels(self.label_names, values)} {child.value}'
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def _child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), list(child.counts)):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                yield f'{self.name}_bucket{_format_labels(self.label_names, values, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.label_names, values)} {child.sum}'
+            yield f'{self.name}_count{_format_labels(self.label_names, values)} {child.count}'
+
+
+class Gauge(Metric):
+    """Gauge read from a callback at scrape time, so it costs nothing on hot paths.
+
+    The callback returns a number, or an iterable of ``(label values, number)``.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), callback=None):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def samples(self):
+        if self.callback is None:
+            return
+        try:
+            result = self.callback()
+        except Exception:
+            return
+        if not self.label_names:
+            yield f'{self.name} {result}'
+            return
+        for values, value in result:
+            yield f'{self.name}{_format_labels(self.label_names, values)} {value}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+
+# Hot-path instrumentation
+STAGE_SECONDS = Histogram('ticket_stage_seconds', 'Latency of ticket operations and their stages', ['stage'])
+COMMAND_SECONDS = Histogram('command_seconds', 'Latency of prefix and slash commands', ['command'])
+BUTTON_SECONDS = Histogram('button_seconds', 'Latency of button callbacks', ['button'])
+REST_REQUESTS = Counter('discord_rest_requests_total', 'Discord REST requests', ['route'])
+REST_RATELIMITED = Counter('discord_rest_ratelimited_total', 'Discord REST responses with status 429', ['route'])
+MONGO_SECONDS = Histogram('mongo_op_seconds', 'Latency of MongoDB operations', ['op'])
+CONFIG_LOOKUPS = Counter('config_cache_lookups_total', 'Per-guild settings cache lookups', ['collection', 'result'])
+CONFIG_UPDATES = Counter('config_cache_updates_total', 'Settings changes applied to the cache', ['collection', 'source'])
+
+
+class Timing:
+    __slots__ = ('count', 'total', 'samples', 'histogram')
+
+    def __init__(self, histogram=None):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=WINDOW)
+        self.histogram = histogram
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+        if self.histogram:
+            self.histogram.observe(seconds)
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Timings:
+    """Named latency samples, e.g. ``create_ticket.channel``.
+
+    Every sample also goes into the ``ticket_stage_seconds`` histogram.
+    """
+
+    def __init__(self, histogram=None):
+        self.histogram = histogram
+        self._timings = {}
+
+    def record(self, name, seconds):
+        timing = self._timings.get(name)
+        if timing is None:
+            histogram = self.histogram.labels(name) if self.histogram else None
+            timing = self._timings[name] = Timing(histogram)
+        timing.add(seconds)
+
+    def get(self, name):
+        return self._timings.get(name)
+
+    def items(self):
+        return sorted(self._timings.items())
+
+    def stages(self, name):
+        """Start timing the stages of one operation"""
+        return StageTimer(self, name)
+
+
+class StageTimer:
+    """Records how long each stage of an operation took.
+
+    ``mark('channel')`` records the time since the previous mark as
+    ``<name>.channel``; ``done()`` records the whole operation as ``<name>``.
+    """
+
+    __slots__ = ('timings', 'name', 'started', 'last')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+        self.started = self.last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.timings.record(f'{self.name}.{stage}', now - self.last)
+        self.last = now
+
+    def done(self, stage=None):
+        now = time.perf_counter()
+        if stage:
+            self.timings.record(f'{self.name}.{stage}', now - self.last)
+        self.timings.record(self.name, now - self.started)
+
+
+timings = Timings(STAGE_SECONDS)
+
+
+def timed(histogram, label):
+    """Decorator that observes a coroutine's duration in ``histogram``"""
+    child = histogram.labels(label)
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+_current_route = contextvars.ContextVar('current_route', default=None)
+
+
+def instrument_http(http):
+    """Count REST requests and 429s per route on a discord.py HTTPClient"""
+    request = http.request
+
+    async def counted_request(route, **kwargs):
+        REST_REQUESTS.labels(route.key).inc()
+        token = _current_route.set(route.key)
+        try:
+            return await request(route, **kwargs)
+        finally:
+            _current_route.reset(token)
+
+    http.request = counted_request
+    # discord.py retries 429s internally; every response, retries included,
+    # passes the session's trace hooks (the session is created at login)
+    trace = http.http_trace or aiohttp.TraceConfig()
+    trace.on_request_end.append(_count_ratelimited)
+    http.http_trace = trace
+
+
+async def _count_ratelimited(session, context, params):
+    # Runs in the task that made the request, so the route is still set
+    if params.response.status == 429:
+        REST_RATELIMITED.labels(_current_route.get() or 'unknown').inc()
@@ -0,0 +1,67 @@
+import os
+
+
+def shard_of(guild_id, shard_count):
+    """Shard Discord routes a guild to"""
+    return (int(guild_id) >> 22) % shard_count
+
+
+def split_shards(shard_count, clusters):
+    """Split shard ids into ``clusters`` contiguous, near-equal ranges"""
+    base, extra = divmod(shard_count, clusters)
+    ranges = []
+    start = 0
+    for cluster in range(clusters):
+        size = base + (1 if cluster < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+class ShardConfig:
+    """Which shards this process runs, read from the environment.
+
+    ``SHARD_COUNT`` and ``SHARD_IDS`` (comma separated) are set by the cluster
+    launcher; ``SHARDED=1`` alone lets discord.py pick the shard count and
+    run every shard in this process.
+    """
+
+    def __init__(self, shard_count=None, shard_ids=None, sharded=False, cluster_id=None):
+        self.shard_count = shard_count
+        self.shard_ids = shard_ids
+        self.sharded = sharded or shard_count is not None or shard_ids is not None
+        self.cluster_id = cluster_id
+        self._owned = set(shard_ids) if shard_ids is not None else None
+
+    @classmethod
+    def from_env(cls, env=os.environ):
+        count = env.get('SHARD_COUNT')
+        ids = env.get('SHARD_IDS')
+        cluster = env.get('CLUSTER_ID')
+        return cls(
+            shard_count=int(count) if count else None,
+            shard_ids=[int(i) for i in ids.split(',') if i.strip()] if ids else None,
+            sharded=env.get('SHARDED') == '1',
+            cluster_id=int(cluster) if cluster else None
+        )
+
+    def owns_guild(self, guild_id):
+        """Whether guild-scoped state for this guild belongs to this process"""
+        if self._owned is None or not self.shard_count:
+            return True
+        return shard_of(guild_id, self.shard_count) in self._owned
+
+    def bot_kwargs(self):
+        kwargs = {}
+        if self.shard_count:
+            kwargs['shard_count'] = self.shard_count
+        if self.shard_ids is not None:
+            kwargs['shard_ids'] = self.shard_ids
+        return kwargs
+
+    def __str__(self):
+        if not self.sharded:
+            return 'unsharded'
+        ids = ','.join(map(str, self.shard_ids)) if self.shard_ids is not None else 'all'
+        label = f'shards {ids} of {self.shard_count or "auto"}'
+        return f'cluster {self.cluster_id}: {label}' if self.cluster_id is not None else label
@@ -0,0 +1,209 @@
+import re
+
+from config_cache import ConfigCache
+
+# Types every guild starts with until an admin edits its list
+DEFAULT_TYPES = {
+    'partnership': {
+        'name': 'Partnership',
+        'emoji': '🤝',
+        'color': 0x5865F2,
+        'description': 'Discuss partnership opportunities',
+        'style': 'primary',
+        'position': 0,
+        'timeout': 7 * 86400
+    },
+    'middleman': {
+        'name': 'Middleman',
+        'emoji': '⚖️',
+        'color': 0xFEE75C,
+        'description': 'Request middleman services',
+        'style': 'secondary',
+        'position': 1,
+        'timeout': 7 * 86400
+    },
+    'support': {
+        'name': 'Support',
+        'emoji': '🎫',
+        'color': 0x57F287,
+        'description': 'Get help and support',
+        'style': 'success',
+        'position': 2,
+        'timeout': 48 * 3600
+    }
+}
+
+# Fields a type may leave out
+FIELD_DEFAULTS = {
+    'emoji': None,
+    'color': 0x5865F2,
+    'description': '',
+    'style': 'secondary',
+    'position': 0,
+    'category': None,  # category name, None for the default ticket category
+    'limit': 1,  # open tickets of this type per user
+    'timeout': None,  # seconds of inactivity before the warning, None to never close
+    'participants': ()  # member and role mentions added to every ticket of the type
+}
+
+EDITABLE_FIELDS = ('name', 'emoji', 'description', 'color', 'style', 'position', 'category', 'limit', 'timeout',
+                   'participants')
+BUTTON_STYLES = ('primary', 'secondary', 'success', 'danger')
+# Panel buttons carry the type key after this prefix; panels posted before
+# types were configurable use 'ticket_<type>'
+BUTTON_PREFIX = 'ticket:'
+LEGACY_BUTTON_PREFIX = 'ticket_'
+# Two panel messages of 25 buttons
+MAX_TYPES = 50
+KEY_PATTERN = re.compile(r'^[a-z0-9][a-z0-9-]{0,31}$')
+MENTION_PATTERN = re.compile(r'<@([!&]?)([0-9]{15,20})>$')
+
+
+def button_id(key):
+    return f'{BUTTON_PREFIX}{key}'
+
+
+def parse_button_id(custom_id):
+    """The type key of a panel button's custom_id, None for other components"""
+    for prefix in (BUTTON_PREFIX, LEGACY_BUTTON_PREFIX):
+        if custom_id.startswith(prefix):
+            return custom_id[len(prefix):] or None
+    return None
+
+
+class TicketTypes:
+    """Per-guild ticket types, read from memory and stored in ``ticket_types``.
+
+    A guild without documents uses ``DEFAULT_TYPES``. The first edit copies
+    the defaults into the database so the guild's list is complete from then
+    on. Lookups are dict reads; the ConfigCache underneath keeps them in step
+    with MongoDB and other instances.
+    """
+
+    def __init__(self, db, owns_guild=None):
+        self.cache = ConfigCache(db, 'ticket_types', 'type', owns_guild=owns_guild)
+
+    def get(self, guild_id, key):
+        """Type settings with defaults filled in, or None if the guild has no such type"""
+        if self.cache.configured(guild_id):
+            doc = self.cache.get(guild_id, key)
+        else:
+            doc = DEFAULT_TYPES.get(key)
+        return {**FIELD_DEFAULTS, **doc} if doc else None
+
+    def for_guild(self, guild_id):
+        """[(key, settings)] in panel order"""
+        if self.cache.configured(guild_id):
+            types = self.cache.guild(guild_id)
+        else:
+            types = DEFAULT_TYPES
+        ordered = sorted(types.items(), key=lambda item: (item[1].get('position', 0), item[0]))
+        return [(key, {**FIELD_DEFAULTS, **doc}) for key, doc in ordered]
+
+    def keys(self, guild_id):
+        return [key for key, _ in self.for_guild(guild_id)]
+
+    # Edits
+    async def add(self, guild_id, key, name):
+        key = key.lower()
+        if not KEY_PATTERN.match(key):
+            raise ValueError('Type keys are 1-32 lowercase letters, digits or dashes')
+        existing = self.for_guild(guild_id)
+        if any(k == key for k, _ in existing):
+            raise ValueError(f'Type `{key}` already exists')
+        if len(existing) >= MAX_TYPES:
+            raise ValueError(f'A server can have at most {MAX_TYPES} ticket types')
+        await self._seed(guild_id)
+        position = max((info['position'] for _, info in existing), default=-1) + 1
+        return await self.cache.set(guild_id, key, {'name': name, 'position': position})
+
+    async def update(self, guild_id, key, field, value):
+        """Change one field from its text form; raises ValueError for bad input"""
+        current = self.get(guild_id, key)
+        if current is None:
+            raise ValueError(f'There is no `{key}` type')
+        fields = {k: v for k, v in current.items() if k not in ('_id', 'guild_id', 'type', 'version')}
+        fields[field] = parse_field(field, value)
+        await self._seed(guild_id)
+        return await self.cache.set(guild_id, key, fields)
+
+    async def remove(self, guild_id, key):
+        existing = self.keys(guild_id)
+        if key not in existing:
+            raise ValueError(f'There is no `{key}` type')
+        if len(existing) == 1:
+            raise ValueError('A server needs at least one ticket type')
+        await self._seed(guild_id)
+        await self.cache.delete(guild_id, key)
+
+    async def _seed(self, guild_id):
+        if not self.cache.configured(guild_id):
+            for key, fields in DEFAULT_TYPES.items():
+                await self.cache.set(guild_id, key, fields)
+
+    # Syncing with MongoDB
+    async def load(self):
+        await self.cache.load()
+
+    def start(self):
+        self.cache.start()
+
+    async def close(self):
+        await self.cache.close()
+
+
+def parse_field(field, value):
+    """Turn the text an admin typed into the stored value of ``field``"""
+    value = value.strip()
+    empty = value.lower() in ('none', 'off', '-')
+    if field in ('name', 'description'):
+        if not value or len(value) > (80 if field == 'name' else 1024):
+            raise ValueError(f'The {field} is empty or too long')
+        return value
+    if field in ('emoji', 'category'):
+        return None if empty else value
+    if field == 'color':
+        try:
+            color = int(value.lstrip('#'), 16)
+        except ValueError:
+            color = -1
+        if not 0 <= color <= 0xFFFFFF:
+            raise ValueError('Colors are hex values like `#5865F2`')
+        return color
+    if field == 'style':
+        if value.lower() not in BUTTON_STYLES:
+            raise ValueError(f'Styles are {", ".join(f"`{s}`" for s in BUTTON_STYLES)}')
+        return value.lower()
+    if field in ('position', 'limit'):
+        if not value.isdigit() or (field == 'limit' and int(value) < 1):
+            raise ValueError(f'The {field} must be a whole number' + (' of at least 1' if field == 'limit' else ''))
+        return int(value)
+    if field == 'timeout':
+        if empty:
+            return None
+        seconds = parse_duration(value)
+        if not seconds:
+            raise ValueError('Timeouts are durations like `48h` or `7d`, or `none`')
+        return seconds
+    if field == 'participants':
+        if empty:
+            return []
+        participants = []
+        for token in value.replace(',', ' ').split():
+            match = MENTION_PATTERN.match(token)
+            if not match:
+                raise ValueError('Participants are member and role mentions like `@Staff @alice`, or `none`')
+            mention = f"<@&{match.group(2)}>" if match.group(1) == '&' else f'<@{match.group(2)}>'
+            if mention not in participants:
+                participants.append(mention)
+        return participants
+    raise ValueError(f'Fields are {", ".join(f"`{f}`" for f in EDITABLE_FIELDS)}')
+
+
+def parse_duration(text):
+    """Seconds in a duration like 30m, 48h or 7d, None if it isn't one"""
+    units = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    text = text.strip().lower()
+    if len(text) < 2 or text[-1] not in units or not text[:-1].isdigit():
+        return None
+    return int(text[:-1]) * units[text[-1]]
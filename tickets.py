@@ -0,0 +1,140 @@
+from collections import Counter
+
+
+class Ticket:
+    __slots__ = ('channel_id', 'guild_id', 'user_id', 'type', 'created_at', 'claimed_by', 'first_claimed_at',
+                 'last_activity', 'warned_at')
+
+    def __init__(self, channel_id, guild_id, user_id, type, created_at, claimed_by=None, first_claimed_at=None,
+                 last_activity=None, warned_at=None):
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.type = type
+        self.created_at = created_at
+        self.claimed_by = claimed_by
+        self.first_claimed_at = first_claimed_at
+        # Last message by a member and the inactivity warning, so restarts keep the countdown
+        self.last_activity = last_activity
+        self.warned_at = warned_at
+
+    def to_document(self):
+        return {
+            'guild_id': self.guild_id,
+            'user_id': self.user_id,
+            'type': self.type,
+            'created_at': self.created_at,
+            'claimed_by': self.claimed_by,
+            'first_claimed_at': self.first_claimed_at,
+            'last_activity': self.last_activity,
+            'warned_at': self.warned_at
+        }
+
+    @classmethod
+    def from_document(cls, doc):
+        return cls(doc['_id'], doc['guild_id'], doc.get('user_id'), doc.get('type'),
+                   doc.get('created_at'), doc.get('claimed_by'), doc.get('first_claimed_at'),
+                   doc.get('last_activity'), doc.get('warned_at'))
+
+
+class GuildTickets:
+    """Open tickets of one guild with live counters"""
+
+    def __init__(self):
+        self.by_channel = {}
+        self.by_user = {}
+        self.by_type = Counter()
+        self.claimed = 0
+
+    @property
+    def open(self):
+        return len(self.by_channel)
+
+    @property
+    def unclaimed(self):
+        return len(self.by_channel) - self.claimed
+
+    def for_user(self, user_id):
+        return [self.by_channel[channel_id] for channel_id in self.by_user.get(user_id, ())]
+
+
+class TicketRegistry:
+    """In-memory index of every open ticket.
+
+    Lookups by channel are global, everything else is per guild. Counters are
+    kept up to date on every change so ``.stats`` never has to scan channels.
+    """
+
+    def __init__(self):
+        self._tickets = {}
+        self._guilds = {}
+
+    def __contains__(self, channel_id):
+        return channel_id in self._tickets
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def __iter__(self):
+        return iter(list(self._tickets.values()))
+
+    def get(self, channel_id):
+        return self._tickets.get(channel_id)
+
+    def guild(self, guild_id):
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            guild = GuildTickets()
+        return guild
+
+    def guilds(self):
+        return self._guilds.items()
+
+    def add(self, ticket):
+        if ticket.channel_id in self._tickets:
+            self.remove(ticket.channel_id)
+        self._tickets[ticket.channel_id] = ticket
+
+        guild = self._guilds.setdefault(ticket.guild_id, GuildTickets())
+        guild.by_channel[ticket.channel_id] = ticket
+        guild.by_user.setdefault(ticket.user_id, set()).add(ticket.channel_id)
+        guild.by_type[ticket.type] += 1
+        if ticket.claimed_by:
+            guild.claimed += 1
+        return ticket
+
+    def remove(self, channel_id):
+        ticket = self._tickets.pop(channel_id, None)
+        if ticket is None:
+            return None
+
+        guild = self._guilds[ticket.guild_id]
+        del guild.by_channel[channel_id]
+        opened = guild.by_user[ticket.user_id]
+        opened.discard(channel_id)
+        if not opened:
+            del guild.by_user[ticket.user_id]
+        guild.by_type[ticket.type] -= 1
+        if not guild.by_type[ticket.type]:
+            del guild.by_type[ticket.type]
+        if ticket.claimed_by:
+            guild.claimed -= 1
+        if not guild.by_channel:
+            del self._guilds[ticket.guild_id]
+        return ticket
+
+    def claim(self, channel_id, user_id, at=None):
+        ticket = self._tickets[channel_id]
+        if not ticket.claimed_by:
+            self._guilds[ticket.guild_id].claimed += 1
+        ticket.claimed_by = user_id
+        if at and not ticket.first_claimed_at:
+            ticket.first_claimed_at = at
+        return ticket
+
+    def unclaim(self, channel_id):
+        ticket = self._tickets[channel_id]
+        if ticket.claimed_by:
+            self._guilds[ticket.guild_id].claimed -= 1
+        ticket.claimed_by = None
+        return ticket
@@ -0,0 +1,235 @@
+import asyncio
+import gzip
+import html
+import json
+import logging
+import os
+import time
+
+import discord
+
+log = logging.getLogger('ticketbot.transcripts')
+
+# Discord's default upload limit
+UPLOAD_LIMIT = 25 * 1024 * 1024
+# Exports running at once; each one pages through history on its own
+CONCURRENCY = 4
+# Uploads running at once, they all go to the same log channel
+UPLOAD_CONCURRENCY = 2
+# How long shutdown waits for uploads still running
+CLOSE_TIMEOUT = 10.0
+STORAGES = ('discord', 'disk', 'gridfs')
+
+HTML_HEADER = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: Arial, sans-serif; background: #313338; color: #dbdee1; }}
+.msg {{ margin: 6px 12px; }}
+.author {{ font-weight: bold; color: #fff; }}
+.time {{ color: #949ba4; font-size: 12px; margin-left: 6px; }}
+.content {{ white-space: pre-wrap; }}
+</style></head><body><h2>{title}</h2>
+'''
+HTML_FOOTER = '</body></html>\n'
+
+
+class Transcript:
+    __slots__ = ('channel_name', 'paths', 'messages', 'seconds')
+
+    def __init__(self, channel_name, paths, messages, seconds):
+        self.channel_name = channel_name
+        self.paths = paths
+        self.messages = messages
+        self.seconds = seconds
+
+    @property
+    def rate(self):
+        return self.messages / self.seconds if self.seconds else 0.0
+
+    @property
+    def size(self):
+        return sum(os.path.getsize(path) for path in self.paths)
+
+
+class TranscriptExporter:
+    """Streams a channel's history to disk and stores the result.
+
+    Messages are written one history page at a time to a gzip-compressed
+    JSONL file (and optionally an HTML file), so memory stays flat no matter
+    how long the ticket is. Disk writes run off the event loop. Storing
+    happens in the background once the files are written, so the channel
+    doesn't have to outlive the upload.
+    """
+
+    def __init__(self, directory, storage='discord', html=False, db=None, concurrency=CONCURRENCY,
+                 upload_concurrency=UPLOAD_CONCURRENCY):
+        if storage not in STORAGES:
+            raise ValueError(f'Unknown transcript storage {storage!r}, use one of {STORAGES}')
+        self.directory = directory
+        self.storage = storage
+        self.html = html
+        self.db = db
+        self._slots = asyncio.Semaphore(concurrency)
+        self._upload_slots = asyncio.Semaphore(upload_concurrency)
+        self._uploads = set()
+
+        # Counters
+        self.exported = 0
+        self.failed = 0
+
+    async def export(self, channel, page_size=100):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: os.makedirs(self.directory, exist_ok=True))
+
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.gmtime())
+        base = os.path.join(self.directory, f'{channel.name}-{channel.id}-{stamp}')
+        paths = [f'{base}.jsonl.gz']
+        jsonl = await loop.run_in_executor(None, gzip.open, paths[0], 'wt', 6, 'utf-8')
+        page_html = None
+        started = time.perf_counter()
+        count = 0
+        try:
+            if self.html:
+                paths.append(f'{base}.html')
+                page_html = await loop.run_in_executor(None, lambda: open(paths[1], 'w', encoding='utf-8'))
+                await loop.run_in_executor(None, page_html.write, HTML_HEADER.format(title=html.escape(f'#{channel.name}')))
+            lines = []
+            blocks = []
+            async for message in channel.history(limit=None, oldest_first=True):
+                record = _record(message)
+                lines.append(json.dumps(record, ensure_ascii=False))
+                if page_html:
+                    blocks.append(_html_block(record))
+                count += 1
+                if len(lines) >= page_size:
+                    await loop.run_in_executor(None, _write, jsonl, page_html, lines, blocks)
+                    lines, blocks = [], []
+            if lines:
+                await loop.run_in_executor(None, _write, jsonl, page_html, lines, blocks)
+            if page_html:
+                await loop.run_in_executor(None, page_html.write, HTML_FOOTER)
+        except BaseException:
+            await self._close_files(jsonl, page_html)
+            await self._remove(paths)
+            raise
+        await self._close_files(jsonl, page_html)
+
+        return Transcript(channel.name, paths, count, time.perf_counter() - started)
+
+    async def store(self, transcript, log_channel=None, metadata=None):
+        """Put the exported files where they are configured to go.
+
+        Returns a short description of where the transcript ended up. The
+        local files are only removed once stored; if storing raises (or is
+        cancelled) they stay on disk.
+        """
+        if self.storage == 'gridfs' and self.db and self.db.connected:
+            ids = []
+            for path in transcript.paths:
+                ids.append(await self.db.upload_file(os.path.basename(path), path, metadata))
+            await self._remove(transcript.paths)
+            return f'GridFS `{ids[0]}`'
+
+        if self.storage == 'discord' and log_channel and transcript.size <= UPLOAD_LIMIT:
+            files = [discord.File(path) for path in transcript.paths]
+            try:
+                await log_channel.send(
+                    f'📜 Transcript of **#{transcript.channel_name}** ({transcript.messages} messages)',
+                    files=files
+                )
+            finally:
+                for file in files:
+                    file.close()
+            await self._remove(transcript.paths)
+            return f'{log_channel.mention}'
+
+        # Disk storage, or the fallback when uploading isn't possible
+        return f'`{transcript.paths[0]}`'
+
+    async def _close_files(self, *files):
+        loop = asyncio.get_running_loop()
+        for file in files:
+            if file:
+                await loop.run_in_executor(None, file.close)
+
+    async def _remove(self, paths):
+        loop = asyncio.get_running_loop()
+        for path in paths:
+            try:
+                await loop.run_in_executor(None, os.remove, path)
+            except FileNotFoundError:
+                pass
+
+    async def run(self, channel, log_channel=None, metadata=None):
+        """Export a transcript, never raising. Returns once the history is on
+        disk; storing it continues in the background."""
+        try:
+            async with self._slots:
+                transcript = await self.export(channel)
+        except Exception as e:
+            self.failed += 1
+            log.error('Transcript of #%s failed: %s', channel.name, e, extra={'channel_id': channel.id})
+            return None
+
+        task = asyncio.create_task(self._store(transcript, log_channel, metadata, channel.id))
+        self._uploads.add(task)
+        task.add_done_callback(self._uploads.discard)
+        return transcript
+
+    async def _store(self, transcript, log_channel, metadata, channel_id):
+        try:
+            async with self._upload_slots:
+                location = await self.store(transcript, log_channel, metadata)
+        except Exception as e:
+            self.failed += 1
+            log.error('Storing the transcript of #%s failed, kept in %s: %s', transcript.channel_name,
+                      transcript.paths[0], e, extra={'channel_id': channel_id})
+            return
+
+        self.exported += 1
+        log.info('Transcript of #%s: %d messages in %.1fs (%.0f msg/s), stored in %s', transcript.channel_name,
+                 transcript.messages, transcript.seconds, transcript.rate, location, extra={'channel_id': channel_id})
+
+    async def close(self, timeout=CLOSE_TIMEOUT):
+        """Wait up to ``timeout`` seconds for uploads still running, then cancel them"""
+        if not self._uploads:
+            return
+        _, pending = await asyncio.wait(list(self._uploads), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            log.warning('Cancelled %d transcript uploads at shutdown, their files stay in %s', len(pending),
+                        self.directory)
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def _record(message):
+    return {
+        'id': message.id,
+        'author_id': message.author.id,
+        'author': str(message.author),
+        'bot': message.author.bot,
+        'created_at': message.created_at.isoformat(),
+        'edited_at': message.edited_at.isoformat() if message.edited_at else None,
+        'content': message.content,
+        'attachments': [a.url for a in message.attachments],
+        'embeds': [e.to_dict() for e in message.embeds]
+    }
+
+
+def _html_block(record):
+    content = html.escape(record['content'])
+    for url in record['attachments']:
+        content += f'\n<a href="{html.escape(url)}">{html.escape(url.rsplit("/", 1)[-1])}</a>'
+    for embed in record['embeds']:
+        title = embed.get('title') or embed.get('description') or 'embed'
+        content += f'\n[{html.escape(title)}]'
+    return (f'<div class="msg"><span class="author">{html.escape(record["author"])}</span>'
+            f'<span class="time">{record["created_at"]}</span>'
+            f'<div class="content">{content}</div></div>\n')
+
+
+def _write(jsonl, page_html, lines, blocks):
+    jsonl.write('\n'.join(lines) + '\n')
+    if page_html:
+        page_html.writelines(blocks)